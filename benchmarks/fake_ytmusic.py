@@ -0,0 +1,117 @@
+"""Stand-in for `ytmusicapi.YTMusic` serving a `SyntheticLibrary`."""
+
+import copy
+import itertools
+import threading
+import time
+
+
+class FakeYTMusic:
+    """In-memory replacement for the ytmusicapi client used by YTMB.
+
+    Responses are deep copies, as a real client would build new objects from
+    each HTTP response. Point YTMB at it with `ytmb.api_client.set_client`.
+
+    Parameters
+    ----------
+    library : benchmarks.synthetic.SyntheticLibrary
+    latency : float, optional
+        Seconds each call sleeps for, to simulate network round trips.
+        Defaults to 0.
+    page_size : int, optional
+        Number of playlist tracks served per simulated request. Longer
+        playlists pay `latency` once per page, as ytmusicapi does. Defaults to
+        100.
+
+    Attributes
+    ----------
+    calls : dict
+        Mapping of method name to the number of times it was called.
+    """
+
+    def __init__(self, library, latency=0.0, page_size=100):
+        self.library = library
+        self.latency = latency
+        self.page_size = page_size
+        self.calls = {}
+        self._lock = threading.Lock()
+        self._playlist_ids = itertools.count()
+
+    def _request(self, name, pages=1):
+        with self._lock:
+            self.calls[name] = self.calls.get(name, 0) + 1
+        if self.latency:
+            time.sleep(self.latency * pages)
+
+    def _find_playlist(self, playlist_id):
+        for playlist in self.library.playlists:
+            if playlist["playlistId"] == playlist_id:
+                return playlist
+        raise KeyError(playlist_id)
+
+    def get_library_playlists(self, limit=25):
+        self._request("get_library_playlists")
+        return [
+            {
+                "playlistId": playlist["playlistId"],
+                "title": playlist["title"],
+                "count": len(playlist["tracks"]),
+                "thumbnails": [],
+            }
+            for playlist in self.library.playlists
+        ]
+
+    def get_playlist(self, playlistId, limit=100):
+        playlist = self._find_playlist(playlistId)
+        tracks = playlist["tracks"] if limit is None else playlist["tracks"][:limit]
+        self._request("get_playlist", pages=max(1, -(-len(tracks) // self.page_size)))
+        return {
+            "id": playlistId,
+            "privacy": "PRIVATE",
+            "title": playlist["title"],
+            "trackCount": len(playlist["tracks"]),
+            "tracks": copy.deepcopy(tracks),
+        }
+
+    def get_library_albums(self, limit=25):
+        self._request("get_library_albums")
+        return copy.deepcopy(self.library.albums)
+
+    def get_library_artists(self, limit=25):
+        self._request("get_library_artists")
+        return copy.deepcopy(self.library.artists)
+
+    def get_library_subscriptions(self, limit=25):
+        self._request("get_library_subscriptions")
+        return copy.deepcopy(self.library.subscriptions)
+
+    def get_album(self, browseId):
+        self._request("get_album")
+        return copy.deepcopy(self.library.album_details[browseId])
+
+    def create_playlist(self, title, description, **kwargs):
+        self._request("create_playlist")
+        playlist_id = f"PLfake{next(self._playlist_ids):028d}"
+        self.library.playlists.append(
+            {"playlistId": playlist_id, "title": title, "tracks": []}
+        )
+        return playlist_id
+
+    def add_playlist_items(self, playlistId, videoIds=None, **kwargs):
+        self._request("add_playlist_items")
+        playlist = self._find_playlist(playlistId)
+        results = []
+        for video_id in videoIds or []:
+            set_video_id = f"set-{playlistId}-{video_id}"
+            playlist["tracks"].append({"videoId": video_id, "setVideoId": set_video_id})
+            results.append({"videoId": video_id, "setVideoId": set_video_id})
+        return {"status": "STATUS_SUCCEEDED", "playlistEditResults": results}
+
+    def remove_playlist_items(self, playlistId, videos):
+        self._request("remove_playlist_items")
+        playlist = self._find_playlist(playlistId)
+        removed = {video["setVideoId"] for video in videos}
+        playlist["tracks"] = [
+            track for track in playlist["tracks"] if track["setVideoId"] not in removed
+        ]
+        return "STATUS_SUCCEEDED"
@@ -0,0 +1,300 @@
+"""Time YTMB syncs of a synthetic library against a stand-in YTMusic client.
+
+Runs a sequence of scenarios on one database, timing `ytmb.main.main` end to
+end and per phase, and writes the results as JSON:
+
+- first_sync: sync into an empty database.
+- noop_resync: sync again with nothing changed.
+- churn_5pct: sync after 5% of playlist entries were replaced.
+- mass_deletion: sync after half of the library was removed.
+
+The peak resident set size of the process is recorded after each scenario.
+It also measures how long the YTMB modules take to import in a fresh
+interpreter without credentials, and whether they load ytmusicapi.
+
+Usage::
+
+    python -m benchmarks.run --output results.json
+    python -m benchmarks.run --output new.json --compare results.json
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+from benchmarks.fake_ytmusic import FakeYTMusic
+from benchmarks.synthetic import churn, generate_library, mass_deletion
+
+# Modules whose import time is measured.
+IMPORTED_MODULES = (
+    "ytmb.models",
+    "ytmb.db",
+    "ytmb.search",
+    "ytmb.api_client",
+    "ytmb.main",
+    "ytmb.browser_data",
+)
+
+_IMPORT_SCRIPT = """
+import json, sys, time
+start = time.perf_counter()
+import {module}
+seconds = time.perf_counter() - start
+print(json.dumps({{"seconds": seconds, "ytmusicapi": "ytmusicapi" in sys.modules}}))
+"""
+
+TABLES = (
+    "playlists",
+    "tracks",
+    "artists",
+    "albums",
+    "track_artists",
+    "playlist_tracks",
+)
+
+
+def _configure_environment(db_path, sqlite_tuning=True):
+    """Point YTMB at a scratch database. Must run before importing ytmb."""
+    os.environ["DB_URI"] = f"sqlite:///{db_path}"
+    os.environ["SQLITE_TUNING"] = "1" if sqlite_tuning else "0"
+    for variable in ("OATH_JSON", "CLIENT_ID", "CLIENT_SECRET"):
+        os.environ.setdefault(variable, "unused")
+
+
+def _row_counts(engine):
+    from sqlalchemy import text
+
+    with engine.connect() as connection:
+        return {
+            table: connection.execute(text(f"SELECT COUNT(*) FROM {table}")).scalar()
+            for table in TABLES
+        }
+
+
+def _peak_rss_mb():
+    """Return the peak resident set size of this process so far, in MiB."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Reported in bytes on macOS and in KiB elsewhere
+    return peak / 1024**2 if sys.platform == "darwin" else peak / 1024
+
+
+def run_scenario(library, argv, latency):
+    """Sync `library` once and return its timings.
+
+    Parameters
+    ----------
+    library : benchmarks.synthetic.SyntheticLibrary
+    argv : list of str
+        Command line arguments passed to `ytmb.main.main`.
+    latency : float
+        Simulated seconds per API request.
+
+    Returns
+    -------
+    dict
+    """
+    from ytmb import api_client, main
+    from ytmb.db import get_engine
+    from ytmb.metrics import registry
+
+    client = FakeYTMusic(library, latency=latency)
+    api_client.set_client(client)
+
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        main.main(argv)
+    seconds = time.perf_counter() - start
+
+    report = registry.report()
+    return {
+        "seconds": seconds,
+        "phases": {
+            timer["labels"]["phase"]: timer["total_seconds"]
+            for timer in report["timers"]
+            if timer["name"] == "phase"
+        },
+        "counters": report["counters"],
+        "api_calls": client.calls,
+        "rows": _row_counts(get_engine()),
+        "peak_rss_mb": _peak_rss_mb(),
+    }
+
+
+def measure_import(module, repeats=5):
+    """Time `import module` in fresh interpreters, without any YTMB settings
+    in the environment.
+
+    Parameters
+    ----------
+    module : str
+    repeats : int, optional
+        Number of interpreters started. The fastest import is reported.
+
+    Returns
+    -------
+    dict
+        With keys "seconds" and "loads_ytmusicapi", or "error" if the module
+        can't be imported, e.g. because an optional dependency is missing.
+    """
+    env = {
+        name: value
+        for name, value in os.environ.items()
+        if name not in ("DB_URI", "OATH_JSON", "CLIENT_ID", "CLIENT_SECRET")
+    }
+    timings = []
+    for _ in range(repeats):
+        process = subprocess.run(
+            [sys.executable, "-c", _IMPORT_SCRIPT.format(module=module)],
+            capture_output=True,
+            text=True,
+            env=env,
+        )
+        if process.returncode != 0:
+            lines = (process.stderr or process.stdout).strip().splitlines()
+            return {"error": lines[-1] if lines else f"exit {process.returncode}"}
+        timings.append(json.loads(process.stdout.strip().splitlines()[-1]))
+    return {
+        "seconds": min(timing["seconds"] for timing in timings),
+        "loads_ytmusicapi": any(timing["ytmusicapi"] for timing in timings),
+    }
+
+
+def run_benchmarks(args):
+    """Run every scenario in order on a fresh database."""
+    library = generate_library(
+        seed=args.seed,
+        n_playlists=args.playlists,
+        n_tracks=args.tracks,
+        n_artists=args.artists,
+        n_albums=args.albums,
+        mean_playlist_length=args.playlist_length,
+    )
+    argv = ["--rate-limit", "1e9", "--workers", str(args.workers), "--no-progress"]
+
+    scenarios = {}
+    scenarios["first_sync"] = run_scenario(library, argv, args.latency)
+    scenarios["noop_resync"] = run_scenario(library, argv, args.latency)
+    library = churn(library, fraction=0.05, seed=args.seed + 1)
+    scenarios["churn_5pct"] = run_scenario(library, argv, args.latency)
+    library = mass_deletion(library, fraction=0.5, seed=args.seed + 2)
+    scenarios["mass_deletion"] = run_scenario(library, argv, args.latency)
+    return scenarios
+
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline):
+    """Print the speed-up of each scenario and phase relative to `baseline`."""
+    print(f"{'scenario':<32}{'baseline s':>12}{'current s':>12}{'speed-up':>10}")
+    for name, scenario in results["scenarios"].items():
+        if name not in baseline["scenarios"]:
+            continue
+        old = baseline["scenarios"][name]
+        rows = [(name, old["seconds"], scenario["seconds"])]
+        rows += [
+            (f"  {phase}", old["phases"][phase], seconds)
+            for phase, seconds in scenario["phases"].items()
+            if phase in old["phases"]
+        ]
+        for label, old_seconds, new_seconds in rows:
+            speed_up = old_seconds / new_seconds if new_seconds else float("inf")
+            print(
+                f"{label:<32}{old_seconds:>12.3f}{new_seconds:>12.3f}{speed_up:>9.2f}x"
+            )
+        if "peak_rss_mb" in scenario and "peak_rss_mb" in old:
+            print(
+                f"{'  peak RSS MiB':<32}{old['peak_rss_mb']:>12.1f}"
+                f"{scenario['peak_rss_mb']:>12.1f}"
+            )
+
+    old_imports = baseline.get("imports", {})
+    for module, timing in results.get("imports", {}).items():
+        old = old_imports.get(module, {})
+        if "seconds" not in timing or "seconds" not in old:
+            continue
+        speed_up = old["seconds"] / timing["seconds"]
+        print(
+            f"{'import ' + module:<32}{old['seconds']:>12.3f}"
+            f"{timing['seconds']:>12.3f}{speed_up:>9.2f}x"
+        )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("-o", "--output", help="Write results to this JSON file")
+    parser.add_argument("--compare", help="Results JSON file to compare against")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--playlists", type=int, default=50)
+    parser.add_argument("--tracks", type=int, default=5000)
+    parser.add_argument("--artists", type=int, default=800)
+    parser.add_argument("--albums", type=int, default=1500)
+    parser.add_argument("--playlist-length", type=int, default=100)
+    parser.add_argument(
+        "--latency",
+        type=float,
+        default=0.01,
+        help="Simulated seconds per API request (default 0.01)",
+    )
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument(
+        "--no-sqlite-tuning",
+        action="store_true",
+        help="Use SQLite's default journal mode and pragmas, e.g. to produce a "
+        "baseline for --compare",
+    )
+    args = parser.parse_args(argv)
+
+    imports = {module: measure_import(module) for module in IMPORTED_MODULES}
+
+    with tempfile.TemporaryDirectory() as directory:
+        _configure_environment(
+            os.path.join(directory, "benchmark.db"),
+            sqlite_tuning=not args.no_sqlite_tuning,
+        )
+        scenarios = run_benchmarks(args)
+
+    results = {
+        "meta": {
+            "commit": _git_commit(),
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+        },
+        "parameters": vars(args),
+        "scenarios": scenarios,
+        "imports": imports,
+    }
+
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+    else:
+        print(output)
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare(results, json.load(f))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,305 @@
+"""Seeded generator of synthetic YouTube Music libraries.
+
+The generated data has the same shape as the ytmusicapi responses used by
+YTMB, including the fields YTMB ignores (thumbnails, durations, feedback
+tokens...), so that payload sizes are realistic.
+"""
+
+import copy
+import random
+
+
+class SyntheticLibrary:
+    """A user library held as ytmusicapi-shaped dicts.
+
+    Attributes
+    ----------
+    playlists : list of dict
+        Each dict has "playlistId", "title" and "tracks" keys.
+    albums : list of dict
+        Saved albums, as returned by `get_library_albums`.
+    artists : list of dict
+        Saved artists, as returned by `get_library_artists`.
+    subscriptions : list of dict
+        Subscriptions, as returned by `get_library_subscriptions`.
+    album_details : dict
+        Mapping of album browseId to the dict returned by `get_album`.
+    catalogue : _Catalogue
+        Pool the library was drawn from, shared by its copies.
+    """
+
+    def __init__(
+        self, playlists, albums, artists, subscriptions, album_details, catalogue
+    ):
+        self.playlists = playlists
+        self.albums = albums
+        self.artists = artists
+        self.subscriptions = subscriptions
+        self.album_details = album_details
+        self.catalogue = catalogue
+
+    def copy(self):
+        """Return a deep copy of the library that shares its catalogue."""
+        return SyntheticLibrary(
+            copy.deepcopy(self.playlists),
+            copy.deepcopy(self.albums),
+            copy.deepcopy(self.artists),
+            copy.deepcopy(self.subscriptions),
+            self.album_details,
+            self.catalogue,
+        )
+
+    def track_count(self):
+        return sum(len(playlist["tracks"]) for playlist in self.playlists)
+
+
+def _zipf_weights(n, exponent):
+    return [1 / (rank + 1) ** exponent for rank in range(n)]
+
+
+def _thumbnails(key):
+    return [
+        {
+            "url": f"https://lh3.googleusercontent.com/{key}=w{size}-h{size}",
+            "width": size,
+            "height": size,
+        }
+        for size in (60, 120, 226, 544)
+    ]
+
+
+class _Catalogue:
+    """Pool of artists, albums and tracks that libraries are drawn from."""
+
+    def __init__(self, rng, n_artists, n_albums, n_tracks, popularity_exponent):
+        self.rng = rng
+        self.artists = [
+            {"name": f"Artist {i:05d}", "id": f"UC{i:022d}"} for i in range(n_artists)
+        ]
+        artist_weights = _zipf_weights(n_artists, popularity_exponent)
+
+        self.albums = []
+        for i in range(n_albums):
+            (artist,) = rng.choices(self.artists, weights=artist_weights)
+            self.albums.append(
+                {
+                    "name": f"Album {i:05d}",
+                    "id": f"MPREb_{i:011d}",
+                    "artist": artist,
+                    "year": str(rng.randint(1960, 2025)),
+                }
+            )
+
+        self.tracks = [self.new_track(i) for i in range(n_tracks)]
+        self.track_weights = _zipf_weights(n_tracks, popularity_exponent)
+        self._next_track = n_tracks
+
+    def new_track(self, i=None):
+        """Return a new track, featuring a second artist 20% of the time and
+        without an album 5% of the time."""
+        if i is None:
+            i = self._next_track
+            self._next_track += 1
+        rng = self.rng
+        album = rng.choice(self.albums)
+        artists = [album["artist"]]
+        if rng.random() < 0.2:
+            featured = rng.choice(self.artists)
+            if featured is not album["artist"]:
+                artists.append(featured)
+        seconds = rng.randint(90, 420)
+        return {
+            "videoId": f"v{i:010d}",
+            "title": f"Track {i:06d}",
+            "artists": [dict(artist) for artist in artists],
+            "album": (
+                None
+                if rng.random() < 0.05
+                else {"name": album["name"], "id": album["id"]}
+            ),
+            "likeStatus": "INDIFFERENT",
+            "inLibrary": None,
+            "thumbnails": _thumbnails(f"v{i:010d}"),
+            "isAvailable": True,
+            "isExplicit": rng.random() < 0.1,
+            "videoType": "MUSIC_VIDEO_TYPE_ATV",
+            "views": None,
+            "duration": f"{seconds // 60}:{seconds % 60:02d}",
+            "duration_seconds": seconds,
+            "setVideoId": f"{i:016X}",
+            "feedbackTokens": {"add": f"AB{i:030d}", "remove": f"AC{i:030d}"},
+        }
+
+    def sample_tracks(self, n):
+        return [
+            copy.deepcopy(track)
+            for track in self.rng.choices(self.tracks, weights=self.track_weights, k=n)
+        ]
+
+
+def generate_library(
+    seed=0,
+    n_playlists=50,
+    n_tracks=5000,
+    n_artists=800,
+    n_albums=1500,
+    mean_playlist_length=100,
+    popularity_exponent=0.8,
+    saved_album_fraction=0.1,
+    saved_artist_fraction=0.1,
+    subscription_fraction=0.05,
+):
+    """Generate a synthetic library.
+
+    Artist, album and track popularity follow Zipf-like distributions, so
+    popular tracks appear in many playlists and popular artists have many
+    albums, giving realistic overlap between playlists.
+
+    Parameters
+    ----------
+    seed : int, optional
+    n_playlists : int, optional
+    n_tracks : int, optional
+        Size of the track pool playlists are drawn from.
+    n_artists : int, optional
+    n_albums : int, optional
+    mean_playlist_length : int, optional
+        Playlist lengths are exponentially distributed around this mean.
+    popularity_exponent : float, optional
+        Exponent of the Zipf-like popularity distributions. 0 is uniform.
+    saved_album_fraction, saved_artist_fraction, subscription_fraction : float,
+    optional
+        Fraction of albums and artists in the user's library.
+
+    Returns
+    -------
+    SyntheticLibrary
+    """
+    rng = random.Random(seed)
+    catalogue = _Catalogue(rng, n_artists, n_albums, n_tracks, popularity_exponent)
+
+    playlists = []
+    for i in range(n_playlists):
+        length = max(1, int(rng.expovariate(1 / mean_playlist_length)))
+        playlists.append(
+            {
+                "playlistId": f"PL{seed:04d}{i:030d}",
+                "title": f"Playlist {i:04d}",
+                "tracks": catalogue.sample_tracks(length),
+            }
+        )
+
+    saved_albums = rng.sample(catalogue.albums, int(n_albums * saved_album_fraction))
+    albums = [
+        {
+            "browseId": album["id"],
+            "playlistId": f"OLAK5uy_{album['id']}",
+            "title": album["name"],
+            "type": "Album",
+            "artists": [dict(album["artist"])],
+            "year": album["year"],
+            "thumbnails": _thumbnails(album["id"]),
+        }
+        for album in saved_albums
+    ]
+    artists = [
+        {
+            "browseId": artist["id"],
+            "artist": artist["name"],
+            "subscribers": f"{rng.randint(1, 999)}K",
+            "thumbnails": _thumbnails(artist["id"]),
+        }
+        for artist in rng.sample(
+            catalogue.artists, int(n_artists * saved_artist_fraction)
+        )
+    ]
+    subscriptions = [
+        {
+            "browseId": artist["id"],
+            "artist": artist["name"],
+            "subscribers": f"{rng.randint(1, 999)}K",
+            "type": "artist",
+            "thumbnails": _thumbnails(artist["id"]),
+        }
+        for artist in rng.sample(
+            catalogue.artists, int(n_artists * subscription_fraction)
+        )
+    ]
+    album_details = {
+        album["id"]: {
+            "title": album["name"],
+            "type": "Album",
+            "year": album["year"],
+            "trackCount": rng.randint(6, 18),
+            "duration_seconds": rng.randint(1200, 4800),
+            "artists": [dict(album["artist"])],
+        }
+        for album in catalogue.albums
+    }
+
+    return SyntheticLibrary(
+        playlists, albums, artists, subscriptions, album_details, catalogue
+    )
+
+
+def churn(library, fraction=0.05, seed=1):
+    """Return a copy of `library` with a fraction of playlist entries replaced.
+
+    Half of the replacements are tracks from the existing pool and half are
+    brand new tracks.
+
+    Parameters
+    ----------
+    library : SyntheticLibrary
+    fraction : float, optional
+        Fraction of all playlist entries to replace. Defaults to 0.05.
+    seed : int, optional
+
+    Returns
+    -------
+    SyntheticLibrary
+    """
+    changed = library.copy()
+    catalogue = changed.catalogue
+    rng = random.Random(seed)
+    catalogue.rng = rng
+
+    entries = [
+        (playlist, i)
+        for playlist in changed.playlists
+        for i in range(len(playlist["tracks"]))
+    ]
+    for playlist, i in rng.sample(entries, int(len(entries) * fraction)):
+        if rng.random() < 0.5:
+            playlist["tracks"][i] = catalogue.new_track()
+        else:
+            (playlist["tracks"][i],) = catalogue.sample_tracks(1)
+    return changed
+
+
+def mass_deletion(library, fraction=0.5, seed=2):
+    """Return a copy of `library` with a fraction of every collection removed.
+
+    Parameters
+    ----------
+    library : SyntheticLibrary
+    fraction : float, optional
+        Fraction of playlists, saved albums, saved artists and subscriptions
+        to remove. Defaults to 0.5.
+    seed : int, optional
+
+    Returns
+    -------
+    SyntheticLibrary
+    """
+    rng = random.Random(seed)
+    changed = library.copy()
+
+    def keep(items):
+        return rng.sample(items, len(items) - int(len(items) * fraction))
+
+    changed.playlists = keep(changed.playlists)
+    changed.albums = keep(changed.albums)
+    changed.artists = keep(changed.artists)
+    changed.subscriptions = keep(changed.subscriptions)
+    return changed
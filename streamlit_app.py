@@ -1,21 +1,58 @@
 import streamlit as st
-import pandas as pd
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
-from ytmb.config import DB_URI
-from ytmb.models import Artist, Track, Album, Playlist, TrackArtist, PlaylistTrack
+from ytmb import browser_data as data
 
+# Choices of the number of rows shown per page.
+PAGE_SIZES = [25, 50, 100, 250, 1000]
 
-@st.cache_resource
-def init_db():
-    engine = create_engine(DB_URI)
-    Session = sessionmaker(bind=engine)
-    return Session
+NO_SUMMARIES_MESSAGE = "The library summary is built by each sync. Run `ytmb` first."
 
 
-def get_session():
-    Session = init_db()
-    return Session()
+def read_page(generation, view, noun, **filters):
+    """Load one page of a view into a DataFrame.
+
+    Shows the total number of results and the page size and page number
+    controls. Only the rows of the selected page are fetched from the
+    database.
+
+    Parameters
+    ----------
+    generation : int or None
+        Current sync generation.
+    view : str
+        Name of the view in `ytmb.browser_data.VIEWS`.
+    noun : str
+        Plural name of the results, e.g. "tracks". Also keys the widgets.
+    **filters
+        Keyword arguments of the view's query function.
+
+    Returns
+    -------
+    pandas.DataFrame
+    """
+    total = data.count_view(generation, view, **filters)
+    st.write(f"Found {total} {noun}")
+
+    col1, col2 = st.columns(2)
+    with col1:
+        page_size = st.selectbox(
+            "Rows per page", PAGE_SIZES, index=1, key=f"{noun}_page_size"
+        )
+    pages = max(1, -(-total // page_size))
+    page_key = f"{noun}_page"
+    if st.session_state.get(page_key, 1) > pages:
+        # The filters changed and the selected page no longer exists
+        st.session_state[page_key] = 1
+    with col2:
+        page = st.number_input("Page", min_value=1, max_value=pages, key=page_key)
+        st.caption(f"{pages} pages")
+
+    return data.load_view(
+        generation, view, page_size, (page - 1) * page_size, **filters
+    )
+
+
+def user_saved_marks(values):
+    return values.map(lambda user_saved: "✓" if user_saved else "")
 
 
 # Main app
@@ -26,65 +63,81 @@ def main():
     # Sidebar navigation
     st.sidebar.title("Navigation")
     page = st.sidebar.selectbox(
-        "Choose a view:", ["Overview", "Artists", "Albums", "Tracks", "Playlists"]
+        "Choose a view:",
+        ["Overview", "Search", "Artists", "Albums", "Tracks", "Playlists"],
     )
 
+    # Cached query results are reused until the next sync finishes
+    generation = data.sync_generation()
+
     if page == "Overview":
-        show_overview()
+        show_overview(generation)
+    elif page == "Search":
+        show_search(generation)
     elif page == "Artists":
-        show_artists()
+        show_artists(generation)
     elif page == "Albums":
-        show_albums()
+        show_albums(generation)
     elif page == "Tracks":
-        show_tracks()
+        show_tracks(generation)
     elif page == "Playlists":
-        show_playlists()
+        show_playlists(generation)
 
 
-def show_overview():
+def show_overview(generation):
     st.header("Database Overview")
 
-    session = get_session()
+    totals = data.load_library_totals(generation)
 
-    artist_count = session.query(Artist).count()
-    track_count = session.query(Track).count()
-    album_count = session.query(Album).count()
-    playlist_count = session.query(Playlist).count()
+    if totals is None:
+        st.info(NO_SUMMARIES_MESSAGE)
+        return
 
     # Display metrics
     col1, col2, col3, col4 = st.columns(4)
 
     with col1:
-        st.metric("Artists", artist_count)
+        st.metric("Artists", totals["artists"])
 
     with col2:
-        st.metric("Tracks", track_count)
+        st.metric("Tracks", totals["tracks"])
 
     with col3:
-        st.metric("Albums", album_count)
+        st.metric("Albums", totals["albums"])
 
     with col4:
-        st.metric("Playlists", playlist_count)
+        st.metric("Playlists", totals["playlists"])
 
     # User saved counts
     st.subheader("User Saved Items")
 
-    user_saved_artists = session.query(Artist).filter(Artist.user_saved).count()
-    user_saved_albums = session.query(Album).filter(Album.user_saved).count()
-
     col1, col2 = st.columns(2)
     with col1:
-        st.metric("User Saved Artists", user_saved_artists)
+        st.metric("User Saved Artists", totals["user_saved_artists"])
     with col2:
-        st.metric("User Saved Albums", user_saved_albums)
+        st.metric("User Saved Albums", totals["user_saved_albums"])
+
+    st.caption(f"As of the last sync, {totals['refreshed_at']:%Y-%m-%d %H:%M} UTC")
+
 
-    session.close()
+def show_search(generation):
+    st.header("Search")
 
+    search_term = st.text_input("Search the library:", "")
 
-def show_artists():
+    if search_term:
+        df = data.load_search_results(generation, search_term, limit=100)
+        st.write(f"Found {len(df)} results")
+        if not df.empty:
+            st.dataframe(df, use_container_width=True)
+
+
+def show_artists(generation):
     st.header("Artists")
 
-    session = get_session()
+    if data.load_library_totals(generation) is None:
+        st.info(NO_SUMMARIES_MESSAGE)
+        return
 
     # Filters
     col1, col2 = st.columns(2)
@@ -93,190 +146,94 @@ def show_artists():
     with col2:
         search_term = st.text_input("Search artists:", "")
 
-    query = session.query(Artist)
-
-    if show_user_saved:
-        query = query.filter(Artist.user_saved)
-
-    if search_term:
-        query = query.filter(Artist.name.ilike(f"%{search_term}%"))
-
-    artists = query.order_by(Artist.name).all()
-
-    st.write(f"Found {len(artists)} artists")
-
-    if artists:
-        artist_data = [
-            {
-                "Name": artist.name,
-                "User Saved": "✓" if artist.user_saved else "",
-                "Track Count": len(artist.tracks),
-            }
-            for artist in artists
-        ]
+    artists = read_page(
+        generation,
+        "artists",
+        "artists",
+        user_saved_only=show_user_saved,
+        search_term=search_term,
+    )
 
-        df = pd.DataFrame(artist_data)
-        st.dataframe(df, use_container_width=True)
+    if not artists.empty:
+        artists["User Saved"] = user_saved_marks(artists["User Saved"])
+        st.dataframe(artists.drop(columns="id"), use_container_width=True)
 
         # Artist details section
-        if artists:
-            st.subheader("Artist Details")
-            selected_artist_name = st.selectbox(
-                "Select an artist to view details:",
-                options=[artist.name for artist in artists],
-                index=0,
-            )
-
-            if selected_artist_name:
-                selected_artist = next(
-                    artist for artist in artists if artist.name == selected_artist_name
-                )
-                show_artist_details(session, selected_artist)
+        st.subheader("Artist Details")
+        selected_artist_name = st.selectbox(
+            "Select an artist to view details:",
+            options=artists["Name"],
+            index=0,
+        )
 
-    session.close()
+        if selected_artist_name:
+            artist_id = artists.loc[artists["Name"] == selected_artist_name, "id"]
+            show_artist_details(
+                generation, int(artist_id.iloc[0]), selected_artist_name
+            )
 
 
-def show_artist_details(session, artist):
+def show_artist_details(generation, artist_id, artist_name):
     """Show detailed information for a selected artist"""
 
     tab1, tab2 = st.tabs(["Tracks", "Albums"])
 
     with tab1:
-        st.subheader(f"Tracks by {artist.name}")
-
-        # Get all tracks by this artist
-        track_artists = session.query(TrackArtist).filter_by(artist_id=artist.id).all()
-
-        if track_artists:
-            track_data = []
-            for ta in track_artists:
-                track = ta.track
+        st.subheader(f"Tracks by {artist_name}")
 
-                # Get all artists for this track (for collaborations)
-                all_track_artists = (
-                    session.query(TrackArtist).filter_by(track_id=track.id).all()
-                )
-                all_artist_names = [ata.artist.name for ata in all_track_artists]
-
-                track_data.append(
-                    {
-                        "Track": track.name,
-                        "All Artists": ", ".join(all_artist_names),
-                        "Album": track.album.name if track.album else "",
-                        "YouTube Music ID": track.ytmusic_id,
-                    }
-                )
+        # Get all tracks by this artist, with all of their artists for
+        # collaborations
+        df_tracks = data.load_artist_tracks(generation, artist_id)
 
-            df_tracks = pd.DataFrame(track_data)
+        if not df_tracks.empty:
             st.dataframe(df_tracks, use_container_width=True)
-            st.write(f"Total tracks: {len(track_data)}")
+            st.write(f"Total tracks: {len(df_tracks)}")
         else:
-            st.info(f"No tracks found for {artist.name}")
+            st.info(f"No tracks found for {artist_name}")
 
     with tab2:
-        st.subheader(f"Albums featuring {artist.name}")
-
-        # Get unique albums that contain tracks by this artist
-        albums_query = (
-            session.query(Album)
-            .join(Track, Track.album_id == Album.id)
-            .join(TrackArtist, TrackArtist.track_id == Track.id)
-            .filter(TrackArtist.artist_id == artist.id)
-            .distinct()
-            .order_by(Album.name)
-        )
+        st.subheader(f"Albums featuring {artist_name}")
 
-        albums = albums_query.all()
-
-        if albums:
-            album_data = []
-            for album in albums:
-                # Count tracks by this artist in this album
-                artist_tracks_in_album = (
-                    session.query(Track)
-                    .join(TrackArtist)
-                    .filter(Track.album_id == album.id)
-                    .filter(TrackArtist.artist_id == artist.id)
-                    .count()
-                )
+        # Albums that contain tracks by this artist
+        albums = data.load_artist_albums(generation, artist_id)
 
-                # Total tracks in album
-                total_tracks_in_album = (
-                    session.query(Track).filter(Track.album_id == album.id).count()
-                )
+        if not albums.empty:
+            albums["User Saved"] = user_saved_marks(albums["User Saved"])
+            st.dataframe(albums.drop(columns="id"), use_container_width=True)
+            st.write(f"Total albums: {len(albums)}")
 
-                album_data.append(
-                    {
-                        "Album": album.name,
-                        "Artist Tracks": artist_tracks_in_album,
-                        "Total Tracks": total_tracks_in_album,
-                        "User Saved": "✓" if album.user_saved else "",
-                    }
-                )
+            # Show detailed album view
+            st.subheader("Album Track Details")
+            selected_album_name = st.selectbox(
+                f"Select an album to see {artist_name}'s tracks:",
+                options=albums["Album"],
+                key="artist_album_select",
+            )
 
-            df_albums = pd.DataFrame(album_data)
-            st.dataframe(df_albums, use_container_width=True)
-            st.write(f"Total albums: {len(album_data)}")
+            if selected_album_name:
+                album_id = albums.loc[albums["Album"] == selected_album_name, "id"]
 
-            # Show detailed album view
-            if albums:
-                st.subheader("Album Track Details")
-                selected_album_name = st.selectbox(
-                    f"Select an album to see {artist.name}'s tracks:",
-                    options=[album.name for album in albums],
-                    key="artist_album_select",
+                # Get tracks by this artist in the selected album
+                df_album_tracks = data.load_artist_album_tracks(
+                    generation, artist_id, int(album_id.iloc[0])
                 )
 
-                if selected_album_name:
-                    selected_album = next(
-                        album for album in albums if album.name == selected_album_name
-                    )
-
-                    # Get tracks by this artist in the selected album
-                    artist_album_tracks = (
-                        session.query(Track)
-                        .join(TrackArtist)
-                        .filter(Track.album_id == selected_album.id)
-                        .filter(TrackArtist.artist_id == artist.id)
-                        .order_by(Track.name)
-                        .all()
+                if not df_album_tracks.empty:
+                    st.dataframe(df_album_tracks, use_container_width=True)
+                else:
+                    st.info(
+                        f"No tracks by {artist_name} found in {selected_album_name}"
                     )
-
-                    if artist_album_tracks:
-                        album_track_data = []
-                        for track in artist_album_tracks:
-                            # Get all artists for this track
-                            all_track_artists = (
-                                session.query(TrackArtist)
-                                .filter_by(track_id=track.id)
-                                .all()
-                            )
-                            all_artist_names = [
-                                ata.artist.name for ata in all_track_artists
-                            ]
-
-                            album_track_data.append(
-                                {
-                                    "Track": track.name,
-                                    "All Artists": ", ".join(all_artist_names),
-                                    "YouTube Music ID": track.ytmusic_id,
-                                }
-                            )
-
-                        df_album_tracks = pd.DataFrame(album_track_data)
-                        st.dataframe(df_album_tracks, use_container_width=True)
-                    else:
-                        st.info(
-                            f"No tracks by {artist.name} found in {selected_album_name}"
-                        )
         else:
-            st.info(f"No albums found featuring {artist.name}")
+            st.info(f"No albums found featuring {artist_name}")
 
 
-def show_albums():
+def show_albums(generation):
     st.header("Albums")
 
-    session = get_session()
+    if data.load_library_totals(generation) is None:
+        st.info(NO_SUMMARIES_MESSAGE)
+        return
 
     col1, col2 = st.columns(2)
     with col1:
@@ -284,169 +241,65 @@ def show_albums():
     with col2:
         search_term = st.text_input("Search albums:", "")
 
-    query = session.query(Album)
-
-    if show_user_saved:
-        query = query.filter(Album.user_saved)
-
-    if search_term:
-        query = query.filter(Album.name.ilike(f"%{search_term}%"))
-
-    albums = query.order_by(Album.name).all()
-
-    st.write(f"Found {len(albums)} albums")
-
-    if albums:
-        album_data = []
-        for album in albums:
-            # Get unique artists for this album
-            artists_query = (
-                session.query(Artist)
-                .join(TrackArtist, TrackArtist.artist_id == Artist.id)
-                .join(Track, Track.id == TrackArtist.track_id)
-                .filter(Track.album_id == album.id)
-                .distinct()
-                .order_by(Artist.name)
-            )
-
-            artists = artists_query.all()
-            artist_names = [artist.name for artist in artists]
-
-            album_data.append(
-                {
-                    "Name": album.name,
-                    "Artists": ", ".join(artist_names) if artist_names else "Unknown",
-                    "User Saved": "✓" if album.user_saved else "",
-                    "Track Count": len(album.tracks) if hasattr(album, "tracks") else 0,
-                }
-            )
-
-        df = pd.DataFrame(album_data)
-        st.dataframe(df, use_container_width=True)
+    albums = read_page(
+        generation,
+        "albums",
+        "albums",
+        user_saved_only=show_user_saved,
+        search_term=search_term,
+    )
 
-    session.close()
+    if not albums.empty:
+        albums["User Saved"] = user_saved_marks(albums["User Saved"])
+        st.dataframe(albums.drop(columns="id"), use_container_width=True)
 
 
-def show_tracks():
+def show_tracks(generation):
     st.header("Tracks")
 
-    session = get_session()
-
     search_term = st.text_input("Search tracks:", "")
 
-    query = session.query(Track).join(Album)
-
-    if search_term:
-        query = query.filter(Track.name.ilike(f"%{search_term}%"))
-
-    tracks = query.order_by(Track.name).all()
+    df = read_page(generation, "tracks", "tracks", search_term=search_term)
 
-    st.write(f"Showing {len(tracks)} tracks")
-
-    if tracks:
-        track_data = []
-        for track in tracks:
-            # Get artists for this track
-            track_artists = (
-                session.query(TrackArtist).filter_by(track_id=track.id).all()
-            )
-            artist_names = [ta.artist.name for ta in track_artists]
-
-            track_data.append(
-                {
-                    "Track": track.name,
-                    "Artists": ", ".join(artist_names),
-                    "Album": track.album.name if track.album else "",
-                    "YouTube Music ID": track.ytmusic_id,
-                }
-            )
-
-        df = pd.DataFrame(track_data)
+    if not df.empty:
         st.dataframe(df, use_container_width=True)
 
-    session.close()
-
 
-def show_playlists():
+def show_playlists(generation):
     st.header("Playlists")
 
-    session = get_session()
+    if data.load_library_totals(generation) is None:
+        st.info(NO_SUMMARIES_MESSAGE)
+        return
 
     search_term = st.text_input("Search playlists:", "")
 
-    query = session.query(Playlist)
+    playlists = read_page(generation, "playlists", "playlists", search_term=search_term)
 
-    if search_term:
-        query = query.filter(Playlist.title.ilike(f"%{search_term}%"))
-
-    playlists = query.order_by(Playlist.title).all()
-
-    st.write(f"Found {len(playlists)} playlists")
-
-    if playlists:
+    if not playlists.empty:
         # Playlist overview
-        playlist_data = []
-        for playlist in playlists:
-            track_count = (
-                session.query(PlaylistTrack).filter_by(playlist_id=playlist.id).count()
-            )
-            playlist_data.append(
-                {"Playlist": playlist.title, "Track Count": track_count}
-            )
-
-        df = pd.DataFrame(playlist_data)
-        st.dataframe(df, use_container_width=True)
+        st.dataframe(playlists.drop(columns="id"), use_container_width=True)
 
         # Detailed view for selected playlist
-        if playlists:
-            st.subheader("Playlist Details")
-            selected_playlist = st.selectbox(
-                "Select a playlist to view details:",
-                options=[p.title for p in playlists],
-                index=0,
-            )
-
-            if selected_playlist:
-                playlist_obj = next(
-                    p for p in playlists if p.title == selected_playlist
-                )
+        st.subheader("Playlist Details")
+        selected_playlist = st.selectbox(
+            "Select a playlist to view details:",
+            options=playlists["Playlist"],
+            index=0,
+        )
 
-                # Get tracks in this playlist
-                playlist_tracks = (
-                    session.query(PlaylistTrack, Track, Album)
-                    .join(Track, PlaylistTrack.track_id == Track.id)
-                    .join(Album, Track.album_id == Album.id)
-                    .filter(PlaylistTrack.playlist_id == playlist_obj.id)
-                    .order_by(PlaylistTrack.position)
-                    .all()
-                )
+        if selected_playlist:
+            playlist_id = int(
+                playlists.loc[playlists["Playlist"] == selected_playlist, "id"].iloc[0]
+            )
 
-                if playlist_tracks:
-                    track_details = []
-                    for pt, track, album in playlist_tracks:
-                        # Get artists for this track
-                        track_artists = (
-                            session.query(TrackArtist)
-                            .filter_by(track_id=track.id)
-                            .all()
-                        )
-                        artist_names = [ta.artist.name for ta in track_artists]
-
-                        track_details.append(
-                            {
-                                "Position": pt.position,
-                                "Track": track.name,
-                                "Artists": ", ".join(artist_names),
-                                "Album": album.name,
-                            }
-                        )
-
-                    df_tracks = pd.DataFrame(track_details)
-                    st.dataframe(df_tracks, use_container_width=True)
-                else:
-                    st.info("This playlist has no tracks.")
+            # Get tracks in this playlist
+            df_tracks = data.load_playlist_tracks(generation, playlist_id)
 
-    session.close()
+            if not df_tracks.empty:
+                st.dataframe(df_tracks, use_container_width=True)
+            else:
+                st.info("This playlist has no tracks.")
 
 
 if __name__ == "__main__":
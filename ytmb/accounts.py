@@ -0,0 +1,203 @@
+import contextlib
+import io
+import json
+import multiprocessing
+import os
+import time
+from sys import exit
+from .gateway import DEFAULT_BURST, DEFAULT_RATE, SharedTokenBucket
+
+# Default number of accounts synced at the same time.
+DEFAULT_PROCESSES = 4
+
+# Environment variable set from each key of an account in the manifest.
+ACCOUNT_SETTINGS = {
+    "db_uri": "DB_URI",
+    "oath_json": "OATH_JSON",
+    "client_id": "CLIENT_ID",
+    "client_secret": "CLIENT_SECRET",
+    "cache_path": "CACHE_PATH",
+}
+REQUIRED_KEYS = ("name", "db_uri", "oath_json")
+
+
+def load_manifest(path):
+    """Read the accounts to sync from a JSON manifest.
+
+    The manifest is a list of accounts, or an object with an "accounts" list.
+    Each account is an object with the keys:
+
+    - name: unique name of the account, used in the report.
+    - db_uri: database the account is backed up to.
+    - oath_json: path of the account's ytmusicapi OAuth file.
+    - client_id, client_secret (optional): OAuth client. Default to the
+      CLIENT_ID and CLIENT_SECRET environment variables.
+    - cache_path (optional): response cache file. Defaults to
+      ytmb_cache_<name>.db, so accounts never share cached responses.
+    - args (optional): list of extra `ytmb` options for the account, e.g.
+      ["--all-playlist"].
+
+    Parameters
+    ----------
+    path : str
+
+    Returns
+    -------
+    list of dict
+    """
+    with open(path) as f:
+        manifest = json.load(f)
+    accounts = manifest["accounts"] if isinstance(manifest, dict) else manifest
+
+    names = set()
+    for i, account in enumerate(accounts):
+        for key in REQUIRED_KEYS:
+            if key not in account:
+                print(f"Account {i} of {path} has no {key!r}. Aborting.")
+                exit(1)
+        if account["name"] in names:
+            print(f"Account name {account['name']!r} is used twice. Aborting.")
+            exit(1)
+        names.add(account["name"])
+    return accounts
+
+
+def _account_environment(account):
+    environment = {
+        variable: account[key]
+        for key, variable in ACCOUNT_SETTINGS.items()
+        if key in account
+    }
+    environment.setdefault("CACHE_PATH", f"ytmb_cache_{account['name']}.db")
+    return environment
+
+
+def _init_worker(limiter):
+    from .api_client import gateway
+
+    gateway.limiter = limiter
+
+
+def _sync_account(job):
+    """Sync one account in a worker process and return its report."""
+    account, argv = job
+    os.environ.update(_account_environment(account))
+
+    from .api_client import get_gateway_stats
+    from .db import Session
+    from .main import main
+    from .metrics import registry
+    from .summaries import get_library_totals
+
+    start = time.perf_counter()
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            main(argv)
+    except (Exception, SystemExit) as error:
+        return {
+            "name": account["name"],
+            "seconds": time.perf_counter() - start,
+            "error": str(error) or type(error).__name__,
+        }
+    seconds = time.perf_counter() - start
+
+    with Session() as session:
+        totals = get_library_totals(session)
+        totals = {
+            key: getattr(totals, key)
+            for key in ("playlists", "tracks", "artists", "albums")
+        }
+    report = registry.report()
+    return {
+        "name": account["name"],
+        "seconds": seconds,
+        "phases": {
+            timer["labels"]["phase"]: timer["total_seconds"]
+            for timer in report["timers"]
+            if timer["name"] == "phase"
+        },
+        "totals": totals,
+        "rows": {
+            name: sum(c["value"] for c in report["counters"] if c["name"] == name)
+            for name in ("rows_inserted", "rows_updated", "rows_deleted")
+        },
+        "api_calls": sum(stats["calls"] for stats in get_gateway_stats().values()),
+    }
+
+
+def sync_accounts(accounts, argv, processes=DEFAULT_PROCESSES, rate=None):
+    """Sync several accounts in parallel worker processes.
+
+    Every account is synced in a fresh process, with its settings from the
+    manifest in the environment. At most `processes` accounts are synced at
+    the same time, and all of them draw their YouTube Music calls from one
+    rate limiter.
+
+    Parameters
+    ----------
+    accounts : list of dict
+        Accounts, as returned by `load_manifest`.
+    argv : list of str
+        `ytmb` options used for every account, before the account's own
+        "args".
+    processes : int, optional
+        Maximum number of accounts synced at the same time. Defaults to
+        `DEFAULT_PROCESSES`.
+    rate : float, optional
+        Calls per second shared by all accounts. Defaults to the rate of a
+        single sync.
+
+    Yields
+    ------
+    dict
+        Report of each account, as soon as its sync finishes. Failed syncs
+        have an "error" key.
+    """
+    rate = DEFAULT_RATE if rate is None else rate
+    context = multiprocessing.get_context("spawn")
+    limiter = SharedTokenBucket(rate, DEFAULT_BURST, context=context)
+    # The shared rate wins over any --rate-limit in an account's args
+    jobs = [
+        (
+            account,
+            [
+                *argv,
+                *account.get("args", []),
+                "--rate-limit",
+                str(rate),
+                "--no-progress",
+            ],
+        )
+        for account in accounts
+    ]
+    with context.Pool(
+        processes=max(1, min(processes, len(jobs))),
+        initializer=_init_worker,
+        initargs=(limiter,),
+        maxtasksperchild=1,
+    ) as pool:
+        yield from pool.imap_unordered(_sync_account, jobs)
+
+
+def print_report(reports, seconds):
+    """Print a table of the reports of `sync_accounts`."""
+    print(
+        f"{'account':<20}{'seconds':>10}{'playlists':>11}{'tracks':>9}"
+        f"{'artists':>9}{'albums':>9}{'inserted':>10}{'deleted':>9}"
+    )
+    for report in sorted(reports, key=lambda report: report["name"]):
+        if "error" in report:
+            print(f"{report['name']:<20}{report['seconds']:>10.1f}  {report['error']}")
+            continue
+        totals, rows = report["totals"], report["rows"]
+        print(
+            f"{report['name']:<20}{report['seconds']:>10.1f}"
+            f"{totals['playlists']:>11}{totals['tracks']:>9}"
+            f"{totals['artists']:>9}{totals['albums']:>9}"
+            f"{rows['rows_inserted']:>10}{rows['rows_deleted']:>9}"
+        )
+    failed = sum("error" in report for report in reports)
+    print(
+        f"{len(reports)} accounts synced in {seconds:.1f} s, "
+        f"{len(reports) - failed} succeeded, {failed} failed"
+    )
@@ -0,0 +1,91 @@
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from ytmb.api_client import get_album_details
+from ytmb.db import get_albums_to_enrich, store_album_details
+from ytmb.metrics import registry
+
+# Default number of albums looked up at the same time. Every call still goes
+# through the rate limiter.
+DEFAULT_ENRICH_WORKERS = 4
+
+# Number of looked up albums stored per commit.
+ENRICH_BATCH_SIZE = 50
+
+
+def collect_album_browse_ids(browse_ids, tracks=(), albums_data=()):
+    """Add the browseIds of the albums of a sync to `browse_ids`.
+
+    Parameters
+    ----------
+    browse_ids : dict
+        Mapping of album name to browseId, updated in place. Albums sharing a
+        name share a row of the albums table, so the first browseId seen for a
+        name is kept, except that saved albums take precedence.
+    tracks : list of TrackRecord, optional
+        Tracks, as returned by `ytmb.records.as_track_records`.
+    albums_data : list of dict, optional
+        Saved albums, as returned by api_client.get_all_albums.
+    """
+    for track in tracks:
+        if track.video_id and track.album is not None and track.album_id:
+            browse_ids.setdefault(track.album, track.album_id)
+    for album_data in albums_data:
+        if album_data["title"] is not None and album_data.get("browseId"):
+            browse_ids[album_data["title"]] = album_data["browseId"]
+
+
+def enrich_albums(session, browse_ids, max_workers=DEFAULT_ENRICH_WORKERS):
+    """Look up and store the year, track count and duration of albums.
+
+    Only albums that were never enriched are looked up, so after the first run
+    only new albums cost a call. Albums are fetched by a pool of worker threads
+    sharing the API rate limiter and stored every `ENRICH_BATCH_SIZE` albums,
+    so an interrupted run resumes where it stopped. Albums that can't be looked
+    up are skipped and tried again on the next run.
+
+    Parameters
+    ----------
+    session : sqlalchemy.orm.Session
+    browse_ids : dict
+        Mapping of album name to browseId, see `collect_album_browse_ids`.
+    max_workers : int, optional
+        Maximum number of albums looked up at the same time. Defaults to
+        `DEFAULT_ENRICH_WORKERS`.
+
+    Returns
+    -------
+    enriched : int
+        Number of albums stored.
+    failed : int
+        Number of albums that couldn't be looked up.
+    """
+    albums = get_albums_to_enrich(session, browse_ids)
+    enriched = failed = 0
+    details = []
+    executor = ThreadPoolExecutor(max_workers=max_workers)
+    try:
+        futures = {
+            executor.submit(get_album_details, browse_id): (album_id, browse_id)
+            for album_id, browse_id in albums
+        }
+        for future in as_completed(futures):
+            album_id, browse_id = futures[future]
+            try:
+                album = future.result()
+            except Exception:
+                failed += 1
+                continue
+            details.append({"id": album_id, "browse_id": browse_id, **album})
+            if len(details) >= ENRICH_BATCH_SIZE:
+                store_album_details(session, details)
+                enriched += len(details)
+                details = []
+        store_album_details(session, details)
+        enriched += len(details)
+    finally:
+        executor.shutdown(cancel_futures=True)
+
+    registry.increment("albums_enriched", enriched)
+    if failed:
+        registry.increment("albums_enrich_failed", failed)
+        print(f"Could not look up {failed} albums. They will be retried next run.")
+    return enriched, failed
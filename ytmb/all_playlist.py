@@ -1,82 +1,309 @@
-from ytmb.api_client import create_playlist, add_tracks_to_playlist
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from ytmb.api_client import (
+    add_tracks_to_playlist,
+    create_playlist,
+    get_all_playlists,
+    get_playlist_tracks,
+    remove_tracks_from_playlist,
+)
 from ytmb.db import (
-    get_all_ytmusic_ids_in_tracks_table,
-    get_all_playlist_titles,
-    get_ytmusic_ids_for_playlist,
+    get_ytmb_all_tracks_to_remove,
+    get_ytmusic_ids_missing_from_ytmb_all,
+    has_ytmb_all_tracks,
+    remove_ytmb_all_tracks,
+    replace_ytmb_all_tracks,
+    store_ytmb_all_tracks,
 )
+from ytmb.metrics import registry
 
 YTMB_ALL_TITLE = "ytmb-all"
 
+# Default number of tracks sent in a single `add_playlist_items` or
+# `remove_playlist_items` call.
+DEFAULT_BATCH_SIZE = 100
+
+# Default number of batches being added or removed at the same time. Every call
+# still goes through the rate limiter.
+DEFAULT_BATCH_WORKERS = 2
+
 
-def _create_ytmb_all_playlist(playlists):
-    """Create ytmb-all playlist if it doesn't exist.
+def _find_ytmb_all_playlist(playlists):
+    """Find the ytmb-all playlist.
+
+    `playlists` may come from the response cache and predate the creation of
+    ytmb-all, so if it isn't listed there the library playlists are fetched
+    again, bypassing the cache.
 
     Parameters
     ----------
     playlists : list
-        List of playlists dicts. Each dict must have "name" and "ytmusic_id" keys. The
-        playlist titles are checked and the ytmb-all playlist is created if it doesn't
-        exist.
+        List of playlists dicts. Each dict must have "name" and "ytmusic_id" keys.
 
     Returns
     -------
-    str
-        ID of playlist.
+    str or None
+        ID of the playlist, or None if it doesn't exist.
     """
-    playlist_titles = [p["name"] for p in playlists]
-
-    if YTMB_ALL_TITLE not in playlist_titles:
-        playlist_id = create_playlist(
-            title=YTMB_ALL_TITLE,
-            description="Playlist automatically created by YTMB",
-        )
-    else:
+    playlist_id = next(
+        (p["ytmusic_id"] for p in playlists if p["name"] == YTMB_ALL_TITLE), None
+    )
+    if playlist_id is None:
         playlist_id = next(
-            (p["ytmusic_id"] for p in playlists if p["name"] == YTMB_ALL_TITLE), None
+            (
+                p["playlistId"]
+                for p in get_all_playlists(cached=False)
+                if p["title"] == YTMB_ALL_TITLE
+            ),
+            None,
         )
-
     return playlist_id
 
 
-def _get_ytmb_all_track_diff(session):
+def _create_ytmb_all_playlist():
+    """Create the ytmb-all playlist.
+
+    Returns
+    -------
+    str
+        ID of playlist.
+    """
+    return create_playlist(
+        title=YTMB_ALL_TITLE,
+        description="Playlist automatically created by YTMB",
+    )
+
+
+def _get_ytmb_all_track_diff(session, playlist_id):
     """Get list of tracks in database that are not in ytmb-all playlist.
 
+    The contents of the playlist are taken from the ytmb_all_tracks table, which
+    records every track added by YTMB, so the playlist isn't downloaded.
+
     Parameters
     ----------
     session : sqlalchemy.orm.Session
+    playlist_id : str
+        ID of the ytmb-all playlist.
 
     Returns
     -------
     list of ytmusic_ids
     """
-    ytmusic_ids_in_database = get_all_ytmusic_ids_in_tracks_table(session)
+    return get_ytmusic_ids_missing_from_ytmb_all(session, playlist_id)
 
-    playlist_titles = get_all_playlist_titles(session)
 
-    if YTMB_ALL_TITLE in playlist_titles:
-        ytmb_all_track_ytmusic_ids = get_ytmusic_ids_for_playlist(
-            session, YTMB_ALL_TITLE
-        )
-    else:
-        ytmb_all_track_ytmusic_ids = []
+def _load_ytmb_all_tracks(session, playlist_id):
+    """Download the ytmb-all playlist and record its tracks as its membership.
+
+    Parameters
+    ----------
+    session : sqlalchemy.orm.Session
+    playlist_id : str
+        ID of the ytmb-all playlist.
+    """
+    # ytmb-all is edited by YTMB, so a cached copy may predate the last edits
+    tracks = get_playlist_tracks(playlist_id, cached=False)
+    replace_ytmb_all_tracks(session, playlist_id, tracks)
+
+
+def _run_in_batches(items, batch_size, max_workers, send, record):
+    """Send items in batches from a pool of worker threads.
+
+    `send(batch)` runs on the worker threads. `record(batch, result)` runs on
+    the calling thread as each batch completes, so it can use the session. If a
+    batch fails, batches that haven't started are cancelled, those in flight
+    are still recorded, and the first error is raised.
+
+    Returns
+    -------
+    int
+        Number of items in the batches that succeeded.
+    """
+    batches = [items[i : i + batch_size] for i in range(0, len(items), batch_size)]
+    done = 0
+    error = None
+    executor = ThreadPoolExecutor(max_workers=max_workers)
+    try:
+        futures = {executor.submit(send, batch): batch for batch in batches}
+        for future in as_completed(futures):
+            if future.cancelled():
+                continue
+            try:
+                result = future.result()
+            except Exception as batch_error:
+                if error is None:
+                    error = batch_error
+                    for pending in futures:
+                        pending.cancel()
+                continue
+            batch = futures[future]
+            record(batch, result)
+            done += len(batch)
+    finally:
+        executor.shutdown(cancel_futures=True)
+
+    if error is not None:
+        raise error
+    return done
+
 
-    track_diff = set(ytmusic_ids_in_database) - set(ytmb_all_track_ytmusic_ids)
+def add_tracks_in_batches(
+    session,
+    playlist_id,
+    tracks,
+    batch_size=DEFAULT_BATCH_SIZE,
+    max_workers=DEFAULT_BATCH_WORKERS,
+):
+    """Add tracks to a playlist in batches, checkpointing each batch.
 
-    return list(track_diff)
+    Batches are sent by a pool of worker threads, all sharing the API rate
+    limit. Each batch that succeeds is recorded in the ytmb_all_tracks table
+    as soon as it completes, so a run that fails part way resumes with the
+    remaining tracks. The latency of every batch is recorded by the
+    "ytmb_all_batch" timer of the metrics registry, labelled action="add".
 
+    If a batch fails, batches that haven't started are cancelled, those in
+    flight are still recorded, and the first error is raised.
 
-def handle_ytmb_all_playlist(playlists, session):
+    Parameters
+    ----------
+    session : sqlalchemy.orm.Session
+    playlist_id : str
+    tracks : list
+        videoIds of the tracks to add.
+    batch_size : int, optional
+        Tracks per `add_playlist_items` call. Defaults to `DEFAULT_BATCH_SIZE`.
+    max_workers : int, optional
+        Batches added at the same time. Defaults to `DEFAULT_BATCH_WORKERS`.
+
+    Returns
+    -------
+    int
+        Number of tracks added.
+    """
+
+    def add_batch(batch):
+        with registry.timer("ytmb_all_batch", action="add"):
+            return add_tracks_to_playlist(playlist_id=playlist_id, tracks=batch)
+
+    def record(batch, edit_results):
+        store_ytmb_all_tracks(session, playlist_id, batch, edit_results)
+
+    return _run_in_batches(tracks, batch_size, max_workers, add_batch, record)
+
+
+def remove_tracks_in_batches(
+    session,
+    playlist_id,
+    tracks,
+    batch_size=DEFAULT_BATCH_SIZE,
+    max_workers=DEFAULT_BATCH_WORKERS,
+):
+    """Remove tracks from a playlist in batches, checkpointing each batch.
+
+    The counterpart of `add_tracks_in_batches`: each batch that succeeds is
+    deleted from the ytmb_all_tracks table as soon as it completes. Latencies
+    are recorded by the "ytmb_all_batch" timer, labelled action="remove".
+
+    Parameters
+    ----------
+    session : sqlalchemy.orm.Session
+    playlist_id : str
+    tracks : list
+        Dicts with the "videoId" and "setVideoId" of the tracks to remove.
+    batch_size : int, optional
+        Tracks per `remove_playlist_items` call. Defaults to
+        `DEFAULT_BATCH_SIZE`.
+    max_workers : int, optional
+        Batches removed at the same time. Defaults to `DEFAULT_BATCH_WORKERS`.
+
+    Returns
+    -------
+    int
+        Number of tracks removed.
+    """
+
+    def remove_batch(batch):
+        with registry.timer("ytmb_all_batch", action="remove"):
+            remove_tracks_from_playlist(playlist_id=playlist_id, tracks=batch)
+
+    def record(batch, _):
+        remove_ytmb_all_tracks(
+            session, playlist_id, [track["setVideoId"] for track in batch]
+        )
+
+    return _run_in_batches(tracks, batch_size, max_workers, remove_batch, record)
+
+
+def handle_ytmb_all_playlist(
+    playlists,
+    session,
+    batch_size=DEFAULT_BATCH_SIZE,
+    max_workers=DEFAULT_BATCH_WORKERS,
+    refresh=False,
+    dry_run=False,
+):
     """Handle creation and modification of ytmb-all playlist.
 
     - Creates ytmb-all playlist if it doesn't exist.
-    - Adds tracks that are in database but not in ytmb-all playlist.
+    - Downloads an existing ytmb-all playlist the first time it is handled, or
+      if `refresh` is True, to record its tracks in the database. Otherwise the
+      recorded tracks are used.
+    - Adds tracks that are in database but not in ytmb-all playlist, and
+      removes tracks that are in ytmb-all playlist but no longer in database,
+      as well as extra copies of tracks that are in it more than once, in
+      checkpointed batches (see `add_tracks_in_batches` and
+      `remove_tracks_in_batches`).
 
     Parameters
     ----------
     playlists : list
         List of playlist dicts.
     session : sqlalchemy.orm.Session
+    batch_size : int, optional
+        Tracks per API call. Defaults to `DEFAULT_BATCH_SIZE`.
+    max_workers : int, optional
+        Batches sent at the same time. Defaults to `DEFAULT_BATCH_WORKERS`.
+    refresh : bool, optional
+        Download the playlist even if its tracks are recorded, e.g. after it was
+        edited outside YTMB. Defaults to False.
+    dry_run : bool, optional
+        Only print the number of tracks that would be added and removed, without
+        creating or editing the playlist. Defaults to False.
+
+    Returns
+    -------
+    tuple of int
+        Number of tracks added and removed, or that would be with `dry_run`.
     """
-    ytmb_all_playlist_id = _create_ytmb_all_playlist(playlists)
-    tracks_to_add = _get_ytmb_all_track_diff(session)
-    add_tracks_to_playlist(playlist_id=ytmb_all_playlist_id, tracks=tracks_to_add)
+    ytmb_all_playlist_id = _find_ytmb_all_playlist(playlists)
+    existed = ytmb_all_playlist_id is not None
+    if not existed and not dry_run:
+        ytmb_all_playlist_id = _create_ytmb_all_playlist()
+    if existed and (refresh or not has_ytmb_all_tracks(session, ytmb_all_playlist_id)):
+        _load_ytmb_all_tracks(session, ytmb_all_playlist_id)
+
+    tracks_to_add = _get_ytmb_all_track_diff(session, ytmb_all_playlist_id)
+    tracks_to_remove = get_ytmb_all_tracks_to_remove(session, ytmb_all_playlist_id)
+    if dry_run:
+        print(
+            f"{YTMB_ALL_TITLE}: would add {len(tracks_to_add)} tracks and remove "
+            f"{len(tracks_to_remove)} tracks"
+        )
+        return len(tracks_to_add), len(tracks_to_remove)
+
+    removed = remove_tracks_in_batches(
+        session,
+        ytmb_all_playlist_id,
+        tracks_to_remove,
+        batch_size=batch_size,
+        max_workers=max_workers,
+    )
+    added = add_tracks_in_batches(
+        session,
+        ytmb_all_playlist_id,
+        tracks_to_add,
+        batch_size=batch_size,
+        max_workers=max_workers,
+    )
+    return added, removed
@@ -1,50 +1,237 @@
-from ytmusicapi import YTMusic, OAuthCredentials
-from .config import OATH_JSON, CLIENT_ID, CLIENT_SECRET
+import threading
+from . import config
+from .gateway import ApiGateway
+from .metrics import registry
+from .response_cache import CacheMissError, ResponseCache
 
-ytmusic = YTMusic(
-    OATH_JSON,
-    oauth_credentials=OAuthCredentials(
-        client_id=CLIENT_ID, client_secret=CLIENT_SECRET
-    ),
-)
+# Default number of playlists fetched concurrently during a sync.
+DEFAULT_FETCH_WORKERS = 8
 
+ytmusic = None
+_client_lock = threading.Lock()
 
-def get_library_state():
-    playlists = get_all_playlists()
-    albums = get_all_albums()
-    artists = get_all_artists()
-    subscriptions = get_all_subscriptions()
-    return playlists, albums, artists, subscriptions
+# Read-only endpoints whose responses may be served from the response cache.
+CACHEABLE_ENDPOINTS = {
+    "get_album",
+    "get_library_albums",
+    "get_library_artists",
+    "get_library_playlists",
+    "get_library_subscriptions",
+    "get_playlist",
+}
 
+# Endpoints that change the library. They are not safe to repeat, so they are only
+# retried when rate limited.
+WRITE_ENDPOINTS = {
+    "add_playlist_items",
+    "create_playlist",
+    "remove_playlist_items",
+}
 
-def get_all_playlists():
-    return ytmusic.get_library_playlists(limit=None)
+gateway = ApiGateway()
+response_cache = None
+offline = False
 
+_MISSING = object()
+
+
+class PlaylistEditError(RuntimeError):
+    """Raised when YouTube Music doesn't apply a playlist edit."""
+
+
+# Endpoint being called by the current thread, to attribute received bytes.
+_current_call = threading.local()
+
+
+def get_client():
+    """Return the YTMusic client, creating it on first use.
+
+    ytmusicapi is only imported here, so that modules which don't talk to
+    YouTube Music load quickly and without credentials.
+    """
+    global ytmusic
+    with _client_lock:
+        if ytmusic is None:
+            from ytmusicapi import OAuthCredentials, YTMusic
+
+            ytmusic = YTMusic(
+                config.get_oath_json(),
+                oauth_credentials=OAuthCredentials(
+                    client_id=config.get_client_id(),
+                    client_secret=config.get_client_secret(),
+                ),
+            )
+            ytmusic._session.hooks["response"].append(_count_response_bytes)
+        return ytmusic
+
+
+def _count_response_bytes(response, *args, **kwargs):
+    """requests response hook recording the size of every response body."""
+    endpoint = getattr(_current_call, "endpoint", None) or "other"
+    registry.increment("api_bytes_received", len(response.content), endpoint=endpoint)
+
+
+def set_client(client):
+    """Make all api_client functions use `client` instead of a YTMusic client
+    built from the configured credentials.
+
+    Parameters
+    ----------
+    client
+        Any object providing the ytmusicapi `YTMusic` methods used here, e.g.
+        the stand-in client of the benchmark suite.
+    """
+    global ytmusic
+    with _client_lock:
+        ytmusic = client
+
+
+def _call(endpoint, *args, **kwargs):
+    """Call `ytmusic.<endpoint>` through the response cache and the
+    rate-limiting, retrying gateway."""
+    with registry.timer("api_call", endpoint=endpoint):
+        return _cached_call(
+            endpoint, args, kwargs, cacheable=endpoint in CACHEABLE_ENDPOINTS
+        )
 
-def get_playlist_tracks(playlist_id):
-    playlist = ytmusic.get_playlist(playlistId=playlist_id, limit=None)
-    return playlist["tracks"]
 
+def _uncached_call(endpoint, *args, **kwargs):
+    """Call `ytmusic.<endpoint>` like `_call`, but never through the response
+    cache, for responses that must be current."""
+    with registry.timer("api_call", endpoint=endpoint):
+        return _cached_call(endpoint, args, kwargs, cacheable=False)
 
-def get_album_year(id):
-    album = ytmusic.get_album(id)
+
+def _cached_call(endpoint, args, kwargs, cacheable):
+    cacheable = cacheable and response_cache is not None
+    if cacheable:
+        response = response_cache.get(
+            endpoint, args, kwargs, default=_MISSING, ignore_ttl=offline
+        )
+        if response is not _MISSING:
+            registry.increment("api_cache_hits", endpoint=endpoint)
+            return response
+
+    if offline:
+        raise CacheMissError(f"No cached response for {endpoint} in offline mode")
+
+    _current_call.endpoint = endpoint
     try:
-        year = album["year"]
-    except KeyError:
-        year = 0
-    return year
+        response = gateway.call(
+            endpoint,
+            getattr(get_client(), endpoint),
+            *args,
+            idempotent=endpoint not in WRITE_ENDPOINTS,
+            **kwargs,
+        )
+    finally:
+        _current_call.endpoint = None
+    if cacheable:
+        response_cache.put(endpoint, args, kwargs, response)
+    return response
+
+
+def enable_response_cache(path, ttl, max_bytes, offline_only=False):
+    """Serve read-only calls from a persistent response cache.
+
+    Parameters
+    ----------
+    path : str
+        Path of the cache file.
+    ttl : float
+        Maximum age, in seconds, of cached responses.
+    max_bytes : int
+        Size cap of the cache.
+    offline_only : bool, optional
+        If True, never go to the network: expired entries are served and calls
+        that can't be answered from the cache raise `CacheMissError`. Defaults
+        to False.
+    """
+    global response_cache, offline
+    response_cache = ResponseCache(path, ttl, max_bytes=max_bytes)
+    offline = offline_only
+
+
+def set_rate_limit(rate):
+    """Set the sustained number of ytmusicapi calls per second."""
+    gateway.limiter.rate = rate
+
+
+def get_gateway_stats():
+    """Return per-endpoint call, error, retry and latency counters."""
+    return gateway.stats()
+
+
+def get_all_playlists(cached=True):
+    """Fetch the playlists of the library.
+
+    Parameters
+    ----------
+    cached : bool, optional
+        Whether the response may come from the response cache. Pass False to
+        see playlists created by YTMB since it was cached. Defaults to True.
+
+    Returns
+    -------
+    list
+    """
+    call = _call if cached else _uncached_call
+    return call("get_library_playlists", limit=None)
+
+
+def get_playlist_tracks(playlist_id, cached=True):
+    """Fetch the tracks of a playlist.
+
+    Parameters
+    ----------
+    playlist_id : str
+    cached : bool, optional
+        Whether the response may come from the response cache. Pass False for
+        playlists edited by YTMB itself, whose cached copy may be out of date.
+        Defaults to True.
+
+    Returns
+    -------
+    list
+    """
+    call = _call if cached else _uncached_call
+    playlist = call("get_playlist", playlistId=playlist_id, limit=None)
+    return playlist["tracks"]
+
+
+def get_album_details(browse_id):
+    """Fetch the year, number of tracks and duration of an album.
+
+    Parameters
+    ----------
+    browse_id : str
+        browseId of the album.
+
+    Returns
+    -------
+    dict
+        With keys "year", "track_count" and "duration_seconds". Values missing
+        from the response are None.
+    """
+    album = _call("get_album", browse_id)
+    year = album.get("year")
+    return {
+        "year": int(year) if year and str(year).isdigit() else None,
+        "track_count": album.get("trackCount"),
+        "duration_seconds": album.get("duration_seconds"),
+    }
 
 
 def get_all_albums():
-    return ytmusic.get_library_albums(limit=None)
+    return _call("get_library_albums", limit=None)
 
 
 def get_all_artists():
-    return ytmusic.get_library_artists(limit=None)
+    return _call("get_library_artists", limit=None)
 
 
 def get_all_subscriptions():
-    return ytmusic.get_library_subscriptions(limit=None)
+    return _call("get_library_subscriptions", limit=None)
 
 
 def create_playlist(title, description):
@@ -59,7 +246,8 @@ def create_playlist(title, description):
     -------
     playlist_id : str
     """
-    playlist_id = ytmusic.create_playlist(
+    playlist_id = _call(
+        "create_playlist",
         title=title,
         description=description,
     )
@@ -74,5 +262,46 @@ def add_tracks_to_playlist(playlist_id, tracks):
     playlist_id : str
     tracks : list
         List of videoIds of tracks to add.
+
+    Returns
+    -------
+    list
+        "playlistEditResults" of the response: a dict with the videoId and the
+        new setVideoId of each added track.
+
+    Raises
+    ------
+    PlaylistEditError
+        If the tracks were not added.
     """
-    ytmusic.add_playlist_items(playlistId=playlist_id, videoIds=tracks)
+    response = _call("add_playlist_items", playlistId=playlist_id, videoIds=tracks)
+    if not _edit_succeeded(response):
+        raise PlaylistEditError(f"Could not add tracks to playlist {playlist_id}")
+    return response.get("playlistEditResults", [])
+
+
+def remove_tracks_from_playlist(playlist_id, tracks):
+    """Remove tracks from playlist
+
+    Parameters
+    ----------
+    playlist_id : str
+    tracks : list
+        List of dicts with the "videoId" and "setVideoId" of each track to
+        remove.
+
+    Raises
+    ------
+    PlaylistEditError
+        If the tracks were not removed.
+    """
+    response = _call("remove_playlist_items", playlistId=playlist_id, videos=tracks)
+    if not _edit_succeeded(response):
+        raise PlaylistEditError(f"Could not remove tracks from playlist {playlist_id}")
+
+
+def _edit_succeeded(response):
+    """Return True if a playlist edit response, a status string or a dict with a
+    "status" key, reports success."""
+    status = response.get("status") if isinstance(response, dict) else response
+    return isinstance(status, str) and "SUCCEEDED" in status
@@ -0,0 +1,282 @@
+import pandas as pd
+import streamlit as st
+from sqlalchemy import func, select
+from .db import Session, get_sync_generation
+from .models import (
+    Album,
+    AlbumSummary,
+    Artist,
+    ArtistAlbumSummary,
+    ArtistSummary,
+    PlaylistSummary,
+    PlaylistTrack,
+    Track,
+    TrackArtist,
+)
+from .search import matching_ids, search
+from .summaries import get_library_totals, string_agg
+
+# Query results of the Streamlit database browser are memoized with
+# `st.cache_data`. Every cached function takes the sync generation as its first
+# argument, so results stay cached until the next sync finishes and are never
+# reused afterwards. Callers get the generation once per rerun from
+# `sync_generation`.
+
+# Maximum number of results kept per cached function, e.g. pages of a view.
+CACHE_MAX_ENTRIES = 256
+
+
+def sync_generation():
+    """Return the current sync generation. Not cached, as it is the cache key."""
+    with Session() as session:
+        return get_sync_generation(session)
+
+
+def _read_sql(session, query):
+    return pd.read_sql(query, session.connection())
+
+
+def artist_names_by_track(session):
+    """Return a subquery of the comma-separated artist names of every track.
+
+    The subquery has the columns `track_id` and `artists`.
+    """
+    return (
+        select(TrackArtist.track_id, string_agg(session, Artist.name).label("artists"))
+        .join(Artist, Artist.id == TrackArtist.artist_id)
+        .group_by(TrackArtist.track_id)
+        .subquery()
+    )
+
+
+def _artists_query(session, user_saved_only=False, search_term=""):
+    query = select(
+        ArtistSummary.artist_id.label("id"),
+        ArtistSummary.name.label("Name"),
+        ArtistSummary.user_saved.label("User Saved"),
+        ArtistSummary.track_count.label("Track Count"),
+        ArtistSummary.album_count.label("Album Count"),
+    )
+    if user_saved_only:
+        query = query.where(ArtistSummary.user_saved)
+    if search_term:
+        query = query.where(
+            ArtistSummary.artist_id.in_(matching_ids(session, "artist", search_term))
+        )
+    return query.order_by(ArtistSummary.name, ArtistSummary.artist_id)
+
+
+def _albums_query(session, user_saved_only=False, search_term=""):
+    query = select(
+        AlbumSummary.album_id.label("id"),
+        AlbumSummary.name.label("Name"),
+        func.coalesce(AlbumSummary.artists, "Unknown").label("Artists"),
+        AlbumSummary.user_saved.label("User Saved"),
+        AlbumSummary.track_count.label("Track Count"),
+    )
+    if user_saved_only:
+        query = query.where(AlbumSummary.user_saved)
+    if search_term:
+        query = query.where(
+            AlbumSummary.album_id.in_(matching_ids(session, "album", search_term))
+        )
+    return query.order_by(AlbumSummary.name, AlbumSummary.album_id)
+
+
+def _tracks_query(session, search_term=""):
+    track_artists = artist_names_by_track(session)
+    query = (
+        select(
+            Track.name.label("Track"),
+            func.coalesce(track_artists.c.artists, "").label("Artists"),
+            Album.name.label("Album"),
+            Track.ytmusic_id.label("YouTube Music ID"),
+        )
+        .join(Album, Track.album_id == Album.id)
+        .outerjoin(track_artists, track_artists.c.track_id == Track.id)
+    )
+    if search_term:
+        query = query.where(Track.id.in_(matching_ids(session, "track", search_term)))
+    return query.order_by(Track.name, Track.id)
+
+
+def _playlists_query(session, search_term=""):
+    query = select(
+        PlaylistSummary.playlist_id.label("id"),
+        PlaylistSummary.title.label("Playlist"),
+        PlaylistSummary.track_count.label("Track Count"),
+    )
+    if search_term:
+        query = query.where(
+            PlaylistSummary.playlist_id.in_(
+                matching_ids(session, "playlist", search_term)
+            )
+        )
+    return query.order_by(PlaylistSummary.title, PlaylistSummary.playlist_id)
+
+
+# Paginated views, by name, and the functions building their queries from
+# keyword filters.
+VIEWS = {
+    "artists": _artists_query,
+    "albums": _albums_query,
+    "tracks": _tracks_query,
+    "playlists": _playlists_query,
+}
+
+
+@st.cache_data(max_entries=CACHE_MAX_ENTRIES)
+def count_view(generation, view, **filters):
+    """Return the number of rows of a view.
+
+    Parameters
+    ----------
+    generation : int or None
+        Sync generation, only used as part of the cache key.
+    view : str
+        One of the keys of `VIEWS`.
+    **filters
+        Keyword arguments of the view's query function.
+
+    Returns
+    -------
+    int
+    """
+    with Session() as session:
+        query = VIEWS[view](session, **filters)
+        return session.execute(
+            select(func.count()).select_from(query.order_by(None).subquery())
+        ).scalar()
+
+
+@st.cache_data(max_entries=CACHE_MAX_ENTRIES)
+def load_view(generation, view, limit, offset, **filters):
+    """Return a window of the rows of a view.
+
+    Parameters
+    ----------
+    generation : int or None
+        Sync generation, only used as part of the cache key.
+    view : str
+        One of the keys of `VIEWS`.
+    limit : int
+    offset : int
+    **filters
+        Keyword arguments of the view's query function.
+
+    Returns
+    -------
+    pandas.DataFrame
+    """
+    with Session() as session:
+        query = VIEWS[view](session, **filters)
+        return _read_sql(session, query.limit(limit).offset(offset))
+
+
+@st.cache_data(max_entries=CACHE_MAX_ENTRIES)
+def load_library_totals(generation):
+    """Return the library totals as a dict, or None before the first sync."""
+    with Session() as session:
+        totals = get_library_totals(session)
+        if totals is None:
+            return None
+        return {
+            column.key: getattr(totals, column.key)
+            for column in totals.__table__.columns
+        }
+
+
+@st.cache_data(max_entries=CACHE_MAX_ENTRIES)
+def load_search_results(generation, term, limit):
+    """Return the results of `ytmb.search.search` as a DataFrame with the
+    columns "Type" and "Name"."""
+    with Session() as session:
+        results = search(session, term, limit=limit)
+    return pd.DataFrame(
+        [(kind.capitalize(), name) for kind, _, name in results],
+        columns=["Type", "Name"],
+    )
+
+
+@st.cache_data(max_entries=CACHE_MAX_ENTRIES)
+def load_playlist_tracks(generation, playlist_id):
+    """Return the tracks of a playlist, in playlist order."""
+    with Session() as session:
+        track_artists = artist_names_by_track(session)
+        query = (
+            select(
+                PlaylistTrack.position.label("Position"),
+                Track.name.label("Track"),
+                func.coalesce(track_artists.c.artists, "").label("Artists"),
+                Album.name.label("Album"),
+            )
+            .join(Track, PlaylistTrack.track_id == Track.id)
+            .join(Album, Track.album_id == Album.id)
+            .outerjoin(track_artists, track_artists.c.track_id == Track.id)
+            .where(PlaylistTrack.playlist_id == playlist_id)
+            .order_by(PlaylistTrack.position)
+        )
+        return _read_sql(session, query)
+
+
+@st.cache_data(max_entries=CACHE_MAX_ENTRIES)
+def load_artist_tracks(generation, artist_id):
+    """Return the tracks of an artist, with all of their artists."""
+    with Session() as session:
+        track_artists = artist_names_by_track(session)
+        query = (
+            select(
+                Track.name.label("Track"),
+                track_artists.c.artists.label("All Artists"),
+                Album.name.label("Album"),
+                Track.ytmusic_id.label("YouTube Music ID"),
+            )
+            .join(TrackArtist, TrackArtist.track_id == Track.id)
+            .join(Album, Album.id == Track.album_id)
+            .join(track_artists, track_artists.c.track_id == Track.id)
+            .where(TrackArtist.artist_id == artist_id)
+            .order_by(TrackArtist.id)
+        )
+        return _read_sql(session, query)
+
+
+@st.cache_data(max_entries=CACHE_MAX_ENTRIES)
+def load_artist_albums(generation, artist_id):
+    """Return the albums containing tracks by an artist, with track counts."""
+    with Session() as session:
+        query = (
+            select(
+                AlbumSummary.album_id.label("id"),
+                AlbumSummary.name.label("Album"),
+                ArtistAlbumSummary.track_count.label("Artist Tracks"),
+                AlbumSummary.track_count.label("Total Tracks"),
+                AlbumSummary.user_saved.label("User Saved"),
+            )
+            .join(
+                ArtistAlbumSummary,
+                ArtistAlbumSummary.album_id == AlbumSummary.album_id,
+            )
+            .where(ArtistAlbumSummary.artist_id == artist_id)
+            .order_by(AlbumSummary.name)
+        )
+        return _read_sql(session, query)
+
+
+@st.cache_data(max_entries=CACHE_MAX_ENTRIES)
+def load_artist_album_tracks(generation, artist_id, album_id):
+    """Return the tracks by an artist in an album."""
+    with Session() as session:
+        track_artists = artist_names_by_track(session)
+        query = (
+            select(
+                Track.name.label("Track"),
+                track_artists.c.artists.label("All Artists"),
+                Track.ytmusic_id.label("YouTube Music ID"),
+            )
+            .join(TrackArtist, TrackArtist.track_id == Track.id)
+            .join(track_artists, track_artists.c.track_id == Track.id)
+            .where(Track.album_id == album_id)
+            .where(TrackArtist.artist_id == artist_id)
+            .order_by(Track.name)
+        )
+        return _read_sql(session, query)
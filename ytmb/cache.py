@@ -0,0 +1,134 @@
+import sys
+from sqlalchemy import select
+from .models import Album, Artist, Track
+
+# Key under which the cache is attached to `Session.info`.
+SESSION_INFO_KEY = "identity_cache"
+
+# Natural key column of each cached table.
+CACHED_KEY_COLUMNS = (Artist.name, Album.name, Track.ytmusic_id)
+
+
+class IdentityCache:
+    """Run-scoped mapping of natural keys to row ids.
+
+    Holds artist name -> id, album name -> id and track videoId -> id for the
+    duration of a sync run. Once preloaded from the database, the cache is
+    authoritative: a key that is not in the cache is not in the database, so
+    lookups never need a SELECT. Rows inserted during the run must be added
+    with `add` to keep it that way.
+
+    Attributes
+    ----------
+    hits : int
+        Number of keys found in the cache.
+    misses : int
+        Number of keys looked up but not found in the cache.
+    """
+
+    def __init__(self):
+        self._ids = {}
+        self.hits = 0
+        self.misses = 0
+
+    def preload(self, session):
+        """Load all keys and ids of the cached tables.
+
+        Parameters
+        ----------
+        session : sqlalchemy.orm.Session
+        """
+        for key_column in CACHED_KEY_COLUMNS:
+            model = key_column.class_
+            rows = session.execute(
+                select(key_column, model.id).order_by(model.id.desc())
+            )
+            self._ids[model.__tablename__] = dict(rows.tuples().all())
+
+    def covers(self, key_column):
+        """Return True if lookups on `key_column` can be answered by the cache."""
+        return key_column.class_.__tablename__ in self._ids
+
+    def lookup(self, key_column, keys):
+        """Map keys to ids without touching the database.
+
+        Parameters
+        ----------
+        key_column : sqlalchemy.orm.InstrumentedAttribute
+            One of `CACHED_KEY_COLUMNS`.
+        keys : iterable
+
+        Returns
+        -------
+        dict
+            Mapping of each key present in the cache to its row id.
+        """
+        table_ids = self._ids[key_column.class_.__tablename__]
+        ids = {}
+        for key in keys:
+            row_id = table_ids.get(key)
+            if row_id is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                ids[key] = row_id
+        return ids
+
+    def add(self, key_column, ids):
+        """Record newly inserted rows.
+
+        Parameters
+        ----------
+        key_column : sqlalchemy.orm.InstrumentedAttribute
+        ids : dict
+            Mapping of key to row id.
+        """
+        table_name = key_column.class_.__tablename__
+        if table_name in self._ids:
+            self._ids[table_name].update(ids)
+
+    def stats(self):
+        """Return hit rate and memory counters.
+
+        Returns
+        -------
+        dict
+            Dict with keys "hits", "misses", "hit_rate", "entries" and
+            "approx_bytes". `approx_bytes` is the shallow size of the dicts plus
+            their keys and values.
+        """
+        lookups = self.hits + self.misses
+        approx_bytes = 0
+        for table_ids in self._ids.values():
+            approx_bytes += sys.getsizeof(table_ids)
+            approx_bytes += sum(
+                sys.getsizeof(key) + sys.getsizeof(row_id)
+                for key, row_id in table_ids.items()
+            )
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": sum(len(table_ids) for table_ids in self._ids.values()),
+            "approx_bytes": approx_bytes,
+        }
+
+
+def attach_identity_cache(session):
+    """Create a preloaded `IdentityCache` and attach it to `session`.
+
+    The bulk store helpers in `ytmb.db` use the attached cache instead of
+    querying the database to resolve artists, albums and tracks.
+
+    Parameters
+    ----------
+    session : sqlalchemy.orm.Session
+
+    Returns
+    -------
+    IdentityCache
+    """
+    cache = IdentityCache()
+    cache.preload(session)
+    session.info[SESSION_INFO_KEY] = cache
+    return cache
@@ -1,26 +1,57 @@
 import os
 from sys import exit
 
-try:
-    DB_URI = os.environ["DB_URI"]
-except KeyError:
-    print("DB_URI environment variable not set. Aborting.")
-    exit(1)
-
-try:
-    OATH_JSON = os.environ["OATH_JSON"]
-except KeyError:
-    print("OATH_JSON environment variable not set. Aborting.")
-    exit(1)
-
-try:
-    CLIENT_ID = os.environ["CLIENT_ID"]
-except KeyError:
-    print("CLIENT_ID environment variable not set. Aborting.")
-    exit(1)
-
-try:
-    CLIENT_SECRET = os.environ["CLIENT_SECRET"]
-except KeyError:
-    print("CLIENT_SECRET environment variable not set. Aborting.")
-    exit(1)
+# Settings are read from the environment when first used rather than at import
+# time, so that modules which don't need a setting can be imported without it.
+
+DEFAULT_CACHE_PATH = "ytmb_cache.db"
+
+
+def _require(name):
+    try:
+        return os.environ[name]
+    except KeyError:
+        print(f"{name} environment variable not set. Aborting.")
+        exit(1)
+
+
+def get_db_uri():
+    return _require("DB_URI")
+
+
+def get_oath_json():
+    return _require("OATH_JSON")
+
+
+def get_client_id():
+    return _require("CLIENT_ID")
+
+
+def get_client_secret():
+    return _require("CLIENT_SECRET")
+
+
+def get_cache_path():
+    return os.environ.get("CACHE_PATH", DEFAULT_CACHE_PATH)
+
+
+def get_sqlite_tuning():
+    return os.environ.get("SQLITE_TUNING", "1") != "0"
+
+
+_SETTINGS = {
+    "DB_URI": get_db_uri,
+    "OATH_JSON": get_oath_json,
+    "CLIENT_ID": get_client_id,
+    "CLIENT_SECRET": get_client_secret,
+    "CACHE_PATH": get_cache_path,
+    "SQLITE_TUNING": get_sqlite_tuning,
+}
+
+
+def __getattr__(name):
+    # Keep `from ytmb.config import DB_URI` and friends working
+    try:
+        return _SETTINGS[name]()
+    except KeyError:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}") from None
@@ -1,6 +1,21 @@
-from sqlalchemy import create_engine
+import hashlib
+import logging
+import os
+import threading
+from datetime import datetime, timezone
+from sqlalchemy import (
+    create_engine,
+    delete,
+    event,
+    func,
+    insert,
+    inspect,
+    select,
+    text,
+    update,
+)
 from sqlalchemy.exc import IntegrityError
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import aliased, sessionmaker
 from .models import (
     Base,
     Playlist,
@@ -8,24 +23,274 @@ from .models import (
     Artist,
     TrackArtist,
     PlaylistTrack,
+    PlaylistSyncState,
     Album,
+    SyncRun,
+    YtmbAllTrack,
+)
+from .cache import SESSION_INFO_KEY
+from .config import get_db_uri, get_sqlite_tuning
+from .metrics import registry
+from .records import as_track_records
+
+logger = logging.getLogger(__name__)
+
+_engine = None
+_engine_lock = threading.Lock()
+
+# Pragmas set on every connection to an SQLite database. In WAL mode the
+# database browser can read while a sync is writing, and synchronous=NORMAL
+# only syncs to disk at checkpoints while staying safe against corruption. The
+# page cache (64 MiB) and memory map (256 MiB) keep lookups out of the kernel.
+SQLITE_PRAGMAS = (
+    "journal_mode=WAL",
+    "synchronous=NORMAL",
+    "cache_size=-65536",
+    "mmap_size=268435456",
 )
-from .config import DB_URI
 
-engine = create_engine(DB_URI)
-Session = sessionmaker(bind=engine)
+
+def get_engine():
+    """Return the database engine, creating it from DB_URI on first use.
+
+    SQLite connections are tuned with `SQLITE_PRAGMAS`, unless the
+    SQLITE_TUNING environment variable is set to 0.
+    """
+    global _engine
+    with _engine_lock:
+        if _engine is None:
+            _engine = create_engine(get_db_uri())
+            if _engine.dialect.name == "sqlite" and get_sqlite_tuning():
+                event.listen(_engine, "connect", _set_sqlite_pragmas)
+            event.listen(_engine, "after_cursor_execute", _count_written_rows)
+            Session.configure(bind=_engine)
+        return _engine
+
+
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    for pragma in SQLITE_PRAGMAS:
+        cursor.execute(f"PRAGMA {pragma}")
+    cursor.close()
+
+
+class _LazySessionmaker(sessionmaker):
+    """sessionmaker that creates the engine the first time a session is made."""
+
+    def __call__(self, **local_kw):
+        get_engine()
+        return super().__call__(**local_kw)
+
+
+Session = _LazySessionmaker()
+
+
+def __getattr__(name):
+    # Keep `from ytmb.db import engine` working
+    if name == "engine":
+        return get_engine()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def _count_written_rows(conn, cursor, statement, parameters, context, executemany):
+    """Record the rows written by every INSERT, UPDATE and DELETE statement."""
+    if context.isinsert:
+        kind = "rows_inserted"
+    elif context.isupdate:
+        kind = "rows_updated"
+    elif context.isdelete:
+        kind = "rows_deleted"
+    else:
+        return
+    if cursor.rowcount > 0:
+        table = getattr(context.compiled.statement, "table", None)
+        registry.increment(kind, cursor.rowcount, table=getattr(table, "name", ""))
+
+
+NO_ALBUM = "No album"
+
+# Number of values bound into a single `IN (...)` clause. Kept well below the
+# SQLite host parameter limit.
+IN_CHUNK_SIZE = 500
+
+# Key under which the id of the current sync run is stored in `Session.info`.
+SYNC_RUN_INFO_KEY = "sync_run_id"
 
 
 def initialize_database():
+    engine = get_engine()
     Base.metadata.create_all(engine)
+    _add_missing_columns()
+    _create_missing_indexes()
+
+
+def has_library():
+    """Return True if DB_URI points to a database that has been synced.
+
+    Unlike `initialize_database`, nothing is created or migrated, so a mistyped
+    DB_URI doesn't leave an empty database behind.
+    """
+    engine = get_engine()
+    database = engine.url.database
+    if (
+        engine.dialect.name == "sqlite"
+        and database
+        and database != ":memory:"
+        and not os.path.exists(database)
+    ):
+        return False
+    inspector = inspect(engine)
+    return all(
+        inspector.has_table(model.__tablename__)
+        for model in (Playlist, Track, Artist, Album)
+    )
+
+
+def _add_missing_columns():
+    """Add columns declared in the models but missing from existing tables.
+
+    `create_all` only creates missing tables, so columns added to a model after
+    its table was created are added here with `ALTER TABLE`. Only suitable for
+    nullable columns without server defaults.
+    """
+    engine = get_engine()
+    inspector = inspect(engine)
+    with engine.begin() as connection:
+        for table in Base.metadata.sorted_tables:
+            existing = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing:
+                    continue
+                column_type = column.type.compile(dialect=engine.dialect)
+                connection.execute(
+                    text(
+                        f"ALTER TABLE {table.name} "
+                        f"ADD COLUMN {column.name} {column_type}"
+                    )
+                )
+
+
+def _create_missing_indexes():
+    """Create indexes declared in the models but missing from existing tables.
+
+    A unique index can't be created on a table that already holds duplicate
+    values. In that case a non-unique index on the same columns is created
+    instead, so lookups still use an index, and a warning is logged. Creating
+    the unique index is tried again on every run, and the non-unique index is
+    dropped once it succeeds.
+    """
+    engine = get_engine()
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            fallback = f"{index.name}_non_unique"
+            try:
+                index.create(engine, checkfirst=True)
+            except IntegrityError:
+                columns = ", ".join(column.name for column in index.columns)
+                with engine.begin() as connection:
+                    connection.execute(
+                        text(
+                            f"CREATE INDEX IF NOT EXISTS {fallback} "
+                            f"ON {table.name} ({columns})"
+                        )
+                    )
+                logger.warning(
+                    "Could not create unique index %s: %s contains duplicate "
+                    "values. Created non-unique index %s instead.",
+                    index.name,
+                    table.name,
+                    fallback,
+                )
+            else:
+                if index.unique:
+                    with engine.begin() as connection:
+                        connection.execute(text(f"DROP INDEX IF EXISTS {fallback}"))
+
+
+def start_sync_run(session):
+    """Record the start of a sync run and make it the session's current run.
+
+    While a run is current, the bulk store helpers stamp every playlist,
+    artist, album and track they store or resolve with the run's id in their
+    `last_seen_run` column, so rows that were not seen can be removed with
+    `remove_unseen_rows` at the end of the run.
+
+    Parameters
+    ----------
+    session : sqlalchemy.orm.Session
+
+    Returns
+    -------
+    int
+        Id of the run in the sync_runs table.
+    """
+    sync_run = SyncRun(started_at=datetime.now(timezone.utc))
+    session.add(sync_run)
+    session.commit()
+
+    session.info[SYNC_RUN_INFO_KEY] = sync_run.id
+
+    return sync_run.id
+
+
+def finish_sync_run(session, sync_run_id):
+    """Record the successful completion of a sync run.
+
+    Parameters
+    ----------
+    session : sqlalchemy.orm.Session
+    sync_run_id : int
+    """
+    sync_run = session.get(SyncRun, sync_run_id)
+    sync_run.finished_at = datetime.now(timezone.utc)
+    session.commit()
+
+    session.info.pop(SYNC_RUN_INFO_KEY, None)
+
 
+def get_sync_generation(session):
+    """Return the id of the last finished sync run, or None if there is none.
 
-def store_playlists(session, playlists_data):
+    The value changes every time a sync finishes, so it can be used to key
+    caches of data read from the database.
+
+    Parameters
+    ----------
+    session : sqlalchemy.orm.Session
+
+    Returns
+    -------
+    int or None
+    """
+    if not inspect(session.get_bind()).has_table(SyncRun.__tablename__):
+        return None
+    return session.execute(
+        select(func.max(SyncRun.id)).where(SyncRun.finished_at.is_not(None))
+    ).scalar()
+
+
+def _mark_seen(session, model, ids):
+    """Stamp rows of `model` with the current sync run, if there is one."""
+    sync_run_id = session.info.get(SYNC_RUN_INFO_KEY)
+    if sync_run_id is None:
+        return
+    for chunk in _chunked(ids):
+        session.execute(
+            update(model)
+            .where(
+                model.id.in_(chunk), model.last_seen_run.is_distinct_from(sync_run_id)
+            )
+            .values(last_seen_run=sync_run_id)
+            .execution_options(synchronize_session=False)
+        )
+
+
+@registry.timed("db_call")
+def store_playlists(session, playlists_data, commit=True):
     """Store playlist information in the database if it does not already exist.
 
-    Iterates through a list of playlist data, checks if each playlist is already
-    present in the database by querying for its YouTube Music ID, and adds to
-    the database if it is not. Commits changes.
+    Resolves all playlist titles with a single set-based lookup and inserts the
+    playlists that are not yet present.
 
     Paramaters
     ----------
@@ -33,6 +298,9 @@ def store_playlists(session, playlists_data):
     playlists_data : list of dict
         List containing playlist data, where each dictionary must include
         `playlistId` and `title` keys.
+    commit : bool, optional
+        Whether to commit once the rows are stored. Pass False to run several
+        stores in one transaction. Defaults to True.
 
     Returns
     -------
@@ -41,541 +309,959 @@ def store_playlists(session, playlists_data):
         "ytmusic_id" (playlistId) and "playlist_table_id" (id in playlist table
         of database).
     """
-    playlists = []
-    for playlist_data in playlists_data:
-        playlist = (
-            session.query(Playlist).filter_by(title=playlist_data["title"]).first()
+    titles = {playlist_data["title"] for playlist_data in playlists_data}
+    playlist_ids = _resolve_ids(session, Playlist.title, titles)
+    _mark_seen(session, Playlist, playlist_ids.values())
+
+    missing = titles - playlist_ids.keys()
+    if missing:
+        sync_run_id = session.info.get(SYNC_RUN_INFO_KEY)
+        session.execute(
+            insert(Playlist),
+            [{"title": title, "last_seen_run": sync_run_id} for title in missing],
         )
+        playlist_ids.update(_resolve_inserted_ids(session, Playlist.title, missing))
 
-        if not playlist:
-            playlist = Playlist(title=playlist_data["title"])
-            session.add(playlist)
-            session.commit()
-
-        playlists.append(
-            {
-                "name": playlist_data["title"],
-                "ytmusic_id": playlist_data["playlistId"],
-                "playlist_table_id": playlist.id,
-            }
-        )
+    if commit:
+        session.commit()
+
+    playlists = [
+        {
+            "name": playlist_data["title"],
+            "ytmusic_id": playlist_data["playlistId"],
+            "playlist_table_id": playlist_ids[playlist_data["title"]],
+        }
+        for playlist_data in playlists_data
+    ]
 
     return playlists
 
 
-def store_artists_from_tracks(session, tracks):
-    """Store unique artists from a list of tracks.
+def _chunked(items, size=IN_CHUNK_SIZE):
+    """Yield successive lists of at most `size` items from `items`."""
+    items = list(items)
+    for i in range(0, len(items), size):
+        yield items[i : i + size]
 
-    Extracts artists from tracks and stores each unique artist in the database.
+
+def _query_ids(session, key_column, keys):
+    """Map key values to row ids using one `IN (...)` query per chunk of keys.
 
     Parameters
     ----------
     session : sqlalchemy.orm.Session
-    tracks : list
-        List containing tracks. For example, returned by
-        api_client.get_playlist_tracks.
+    key_column : sqlalchemy.orm.InstrumentedAttribute
+        Column to look the keys up in, e.g. `Artist.name`.
+    keys : iterable
 
     Returns
     -------
-    set
-        The set of unique artists in `tracks`.
+    dict
+        Mapping of each key present in the database to the id of its row. If a
+        key matches several rows, the lowest id wins.
     """
-    unique_artists = {artist["name"] for track in tracks for artist in track["artists"]}
+    model = key_column.class_
+    ids = {}
+    for chunk in _chunked(keys):
+        rows = session.execute(
+            select(key_column, model.id)
+            .where(key_column.in_(chunk))
+            .order_by(model.id.desc())
+        )
+        ids.update(rows.tuples().all())
+    return ids
 
-    for artist in unique_artists:
-        store_artist(session, artist)
 
-    return unique_artists
+def _resolve_ids(session, key_column, keys):
+    """Map key values to the ids of existing rows.
 
+    Answered from the identity cache attached to `session` (see
+    `ytmb.cache.attach_identity_cache`) when there is one, otherwise from the
+    database.
+    """
+    cache = session.info.get(SESSION_INFO_KEY)
+    if cache is not None and cache.covers(key_column):
+        return cache.lookup(key_column, keys)
+    return _query_ids(session, key_column, keys)
 
-def store_albums_from_tracks(session, tracks):
-    """Store unique albums from a list of tracks.
 
-    Extracts albums from tracks and stores each unique album in the database.
+def _resolve_inserted_ids(session, key_column, keys):
+    """Map the keys of freshly inserted rows to their ids.
+
+    Always queries the database, and records the result in the identity cache
+    attached to `session`, if any.
+    """
+    ids = _query_ids(session, key_column, keys)
+    cache = session.info.get(SESSION_INFO_KEY)
+    if cache is not None:
+        cache.add(key_column, ids)
+    return ids
+
+
+def _store_names(session, name_column, names, user_saved, exclusive=False):
+    """Get or create rows by name in bulk and set their `user_saved` flag.
+
+    Does not commit.
 
     Parameters
     ----------
     session : sqlalchemy.orm.Session
-    tracks : list
-        List containing tracks. For example, returned by
-        api_client.get_playlist_tracks.
+    name_column : sqlalchemy.orm.InstrumentedAttribute
+        Either `Artist.name` or `Album.name`.
+    names : iterable of str
+    user_saved : bool
+    exclusive : bool, optional
+        If True, `names` is the complete set of user saved rows, and all other
+        rows have their `user_saved` flag cleared first. Defaults to False.
 
     Returns
     -------
-    unique_albums : set
-        The set of unique albums in `tracks`.
+    dict
+        Mapping of name to row id for every name in `names`.
     """
-    unique_albums = {
-        track["album"]["name"] for track in tracks if track.get("album") is not None
-    }
+    model = name_column.class_
+    names = set(names)
+    ids = _resolve_ids(session, name_column, names)
+
+    if exclusive:
+        session.execute(
+            update(model)
+            .where(model.user_saved)
+            .values(user_saved=False)
+            .execution_options(synchronize_session=False)
+        )
 
-    for album in unique_albums:
-        store_album(session, album)
+    existing_ids = list(ids.values())
+    for chunk in _chunked(existing_ids):
+        session.execute(
+            update(model)
+            .where(model.id.in_(chunk), model.user_saved != user_saved)
+            .values(user_saved=user_saved)
+            .execution_options(synchronize_session=False)
+        )
+
+    _mark_seen(session, model, existing_ids)
+
+    missing = names - ids.keys()
+    if missing:
+        sync_run_id = session.info.get(SYNC_RUN_INFO_KEY)
+        session.execute(
+            insert(model),
+            [
+                {
+                    name_column.key: name,
+                    "user_saved": user_saved,
+                    "last_seen_run": sync_run_id,
+                }
+                for name in missing
+            ],
+        )
+        ids.update(_resolve_inserted_ids(session, name_column, missing))
+
+    return ids
 
-    return unique_albums
 
+@registry.timed("db_call")
+def store_artists(session, artist_names, user_saved=False):
+    """Store many artists at once, creating those not already present.
 
-def store_album(session, album_name, user_saved=False):
-    """Store an album in the database if not already present.
+    Existing artists have their `user_saved` column set to `user_saved`. Does
+    not commit.
 
     Parameters
     ----------
     session : sqlalchemy.orm.Session
-    album_name : str or None
-        Name of the album.
+    artist_names : iterable of str
     user_saved : bool, optional
-        Boolean label to use for the `user_saved` column of the `albums` table.
+        Boolean label to use for the `user_saved` column of the `artists` table.
         Defaults to False.
 
     Returns
     -------
-    Album
-        The album object stored in the database.
+    dict
+        Mapping of artist name to id in the artists table.
     """
-    album = session.query(Album).filter_by(name=album_name).first()
-
-    if not album:
-        album = Album(name=album_name, user_saved=user_saved)
-        session.add(album)
-    elif user_saved and not album.user_saved:
-        album.user_saved = True
-    elif not user_saved and album.user_saved:
-        album.user_saved = False
+    return _store_names(session, Artist.name, artist_names, user_saved)
 
-    session.commit()
-
-    return album
 
+@registry.timed("db_call")
+def store_albums(session, album_names, user_saved=False):
+    """Store many albums at once, creating those not already present.
 
-def store_album_from_track_data(session, track_data):
-    """Store album information extracted from track data in the database.
-
-    Extracts album information from track data and stores it using
-    `store_album`.
+    Existing albums have their `user_saved` column set to `user_saved`. Does
+    not commit.
 
     Parameters
     ----------
     session : sqlalchemy.orm.Session
-    track_data : dict
-        Dictionary containing track information, including `album` key.
+    album_names : iterable of str
+    user_saved : bool, optional
+        Boolean label to use for the `user_saved` column of the `albums` table.
+        Defaults to False.
 
     Returns
     -------
-    Album
-        The album object stored in the database.
+    dict
+        Mapping of album name to id in the albums table.
     """
-    if track_data["album"] is None:
-        album_name = "No album"
-    else:
-        album_name = track_data["album"]["name"]
-    album = store_album(session, album_name)
+    return _store_names(session, Album.name, album_names, user_saved)
 
-    return album
 
+def _album_name_from_record(record):
+    return NO_ALBUM if record.album is None else record.album
 
-def store_album_from_album_data(session, album_data, user_saved=False):
-    """Store album information extracted from album data in the database.
 
-    Extracts album information from album data and stores it using
-    `store_album`.
+def get_artist_and_album_names(tracks):
+    """Return the unique artist and album names in a list of tracks.
+
+    Tracks without a videoId are ignored, as they are never stored. Tracks
+    without an album count as being on the `NO_ALBUM` album.
 
     Parameters
     ----------
-    session : sqlalchemy.orm.Session
-    album_data : dict
-        Dictionary containing album information, must include `title` key.
-    user_saved : bool, optional
-        Boolean label to use for the `user_saved` column of the `albums` table.
-        Defaults to False.
+    tracks : list of dict or list of TrackRecord
+        List containing tracks, as returned by api_client.get_playlist_tracks,
+        or their `ytmb.records.TrackRecord`.
 
     Returns
     -------
-    Album
-        The album object stored in the database.
+    unique_artists : set
+    unique_albums : set
     """
-    if album_data["title"] is None:
-        album_name = "No album"
-    else:
-        album_name = album_data["title"]
+    tracks = [track for track in as_track_records(tracks) if track.video_id]
+    unique_artists = {artist for track in tracks for artist in track.artists}
+    unique_albums = {_album_name_from_record(track) for track in tracks}
+    return unique_artists, unique_albums
 
-    album = store_album(session, album_name, user_saved=user_saved)
 
-    return album
+@registry.timed("db_call")
+def store_tracks_from_playlist(session, playlist_table_id, tracks, commit=True):
+    """Store all tracks of a playlist and their relationships in one batch.
 
+    Stores the tracks' artists and albums, the tracks and their links to the
+    playlist and artists. Existing artists, albums and tracks are resolved with
+    one `IN (...)` query per chunk of keys of each entity type, and missing rows
+    are inserted with executemany.
 
-def store_track_from_playlist(
-    session, playlist_table_id, track_data, track_position_in_playlist
-):
-    """Store track and relationships from a playlist in the database.
-
-    Checks and stores track and related artist/album information in the
-    database, and handles PlaylistTrack relationships.
+    The playlist's existing links to tracks are replaced, so tracks that left
+    it are unlinked and moved tracks get their new position.
 
     Parameters
     ----------
     session : sqlalchemy.orm.Session
     playlist_table_id : int
-        The unique integer ID of the playlist in the playlists tabls of the
+        The unique integer ID of the playlist in the playlists table of the
         database.
-    track_data : dict
-        Dictionary containing track information, must include `videoId`,
-        `title`, `album`, and `artists`.
-    track_position_in_playlist : int
-        Position of the track within the playlist.
-    """
-    # Check if track exists
-    track = session.query(Track).filter_by(ytmusic_id=track_data["videoId"]).first()
-
-    if not track:
-        album = store_album_from_track_data(session, track_data)
-
-        # Create new track
-        track = Track(
-            ytmusic_id=track_data["videoId"],
-            name=track_data["title"],
-            album_id=album.id,
+    tracks : list of dict or list of TrackRecord
+        List containing tracks, as returned by api_client.get_playlist_tracks,
+        or their `ytmb.records.TrackRecord`. Each track's position in the list
+        is used as its position in the playlist.
+    commit : bool, optional
+        Whether to commit once the rows are stored. Pass False to run several
+        stores in one transaction. Defaults to True.
+    """
+    # Tracks without a videoId (e.g. unavailable uploads) can't be stored
+    positioned_tracks = [
+        (position, track)
+        for position, track in enumerate(as_track_records(tracks))
+        if track.video_id
+    ]
+
+    unique_artists, unique_albums = get_artist_and_album_names(
+        [track for _, track in positioned_tracks]
+    )
+
+    artist_ids = store_artists(session, unique_artists)
+    album_ids = store_albums(session, unique_albums)
+
+    track_ids = _resolve_ids(
+        session, Track.ytmusic_id, {track.video_id for _, track in positioned_tracks}
+    )
+    _mark_seen(session, Track, track_ids.values())
+
+    new_tracks = {}
+    stored_tracks = {}
+    for _, track in positioned_tracks:
+        if track.video_id in track_ids:
+            stored_tracks.setdefault(track_ids[track.video_id], track)
+        else:
+            new_tracks.setdefault(track.video_id, track)
+    _relink_tracks(session, stored_tracks, artist_ids, album_ids)
+
+    if new_tracks:
+        sync_run_id = session.info.get(SYNC_RUN_INFO_KEY)
+        session.execute(
+            insert(Track),
+            [
+                {
+                    "ytmusic_id": video_id,
+                    "name": track.title,
+                    "album_id": album_ids[_album_name_from_record(track)],
+                    "last_seen_run": sync_run_id,
+                }
+                for video_id, track in new_tracks.items()
+            ],
         )
-        session.add(track)
-
-        # Handle artists
-        for artist_data in track_data["artists"]:
-            artist = store_artist(session, artist_data["name"])
-
-            # Create TrackArtist relation if it doesn't exist
-            if (
-                not session.query(TrackArtist)
-                .filter_by(artist_id=artist.id, track_id=track.id)
-                .first()
-            ):
-                track_artist = TrackArtist(artist_id=artist.id, track_id=track.id)
-                session.add(track_artist)
-
-    # Handle PlaylistTrack relationship
-    if (
-        not session.query(PlaylistTrack)
-        .filter_by(playlist_id=playlist_table_id, track_id=track.id)
-        .first()
+        new_track_ids = _resolve_inserted_ids(session, Track.ytmusic_id, new_tracks)
+        track_ids.update(new_track_ids)
+
+        track_artists = {
+            (artist_ids[artist], new_track_ids[video_id])
+            for video_id, track in new_tracks.items()
+            for artist in track.artists
+        }
+        if track_artists:
+            session.execute(
+                insert(TrackArtist),
+                [
+                    {"artist_id": artist_id, "track_id": track_id}
+                    for artist_id, track_id in track_artists
+                ],
+            )
+
+    # Only the first occurrence of a track in the playlist is recorded
+    _execute_delete(session, PlaylistTrack.playlist_id == playlist_table_id)
+    linked_track_ids = set()
+    playlist_tracks = []
+    for position, track in positioned_tracks:
+        track_id = track_ids[track.video_id]
+        if track_id not in linked_track_ids:
+            linked_track_ids.add(track_id)
+            playlist_tracks.append(
+                {
+                    "playlist_id": playlist_table_id,
+                    "track_id": track_id,
+                    "position": position,
+                }
+            )
+    if playlist_tracks:
+        session.execute(insert(PlaylistTrack), playlist_tracks)
+
+    if commit:
+        session.commit()
+
+
+def _relink_tracks(session, tracks, artist_ids, album_ids):
+    """Point stored tracks at their current album and artists.
+
+    Keeps tracks whose album or artists were renamed since they were stored
+    linked to the rows of the new names.
+
+    Parameters
+    ----------
+    session : sqlalchemy.orm.Session
+    tracks : dict
+        Mapping of track id to `TrackRecord`.
+    artist_ids, album_ids : dict
+        Mapping of artist and album name to id, covering every name of
+        `tracks`.
+    """
+    album_updates = []
+    relinked_track_ids = []
+    for chunk in _chunked(tracks):
+        current_albums = dict(
+            session.execute(select(Track.id, Track.album_id).where(Track.id.in_(chunk)))
+            .tuples()
+            .all()
+        )
+        current_artists = {}
+        for track_id, artist_id in session.execute(
+            select(TrackArtist.track_id, TrackArtist.artist_id).where(
+                TrackArtist.track_id.in_(chunk)
+            )
+        ):
+            current_artists.setdefault(track_id, set()).add(artist_id)
+
+        for track_id in chunk:
+            track = tracks[track_id]
+            album_id = album_ids[_album_name_from_record(track)]
+            if current_albums.get(track_id) != album_id:
+                album_updates.append({"id": track_id, "album_id": album_id})
+            artists = {artist_ids[artist] for artist in track.artists}
+            if current_artists.get(track_id, set()) != artists:
+                relinked_track_ids.append(track_id)
+
+    if album_updates:
+        session.execute(update(Track), album_updates)
+    for chunk in _chunked(relinked_track_ids):
+        _execute_delete(session, TrackArtist.track_id.in_(chunk))
+    track_artists = [
+        {"artist_id": artist_ids[artist], "track_id": track_id}
+        for track_id in relinked_track_ids
+        for artist in dict.fromkeys(tracks[track_id].artists)
+    ]
+    if track_artists:
+        session.execute(insert(TrackArtist), track_artists)
+
+
+@registry.timed("db_call")
+def mark_tracks_seen(session, tracks, playlist_table_id=None, commit=True):
+    """Mark already stored tracks, and their artists and albums, as seen.
+
+    Used for playlists that are unchanged since the last run, so that their
+    contents survive `remove_unseen_rows` without being stored again. If a
+    track, or the name of one of its artists or its album, isn't in the
+    database, e.g. because it was renamed, the playlist must be stored with
+    `store_tracks_from_playlist` instead.
+
+    Parameters
+    ----------
+    session : sqlalchemy.orm.Session
+    tracks : list of dict or list of TrackRecord
+        List containing tracks, as returned by api_client.get_playlist_tracks,
+        or their `ytmb.records.TrackRecord`.
+    playlist_table_id : int, optional
+        Id of the playlist in the playlists table. If given, the playlist must
+        also be linked to every track to count as complete.
+    commit : bool, optional
+        Whether to commit once the rows are stored. Pass False to run several
+        stores in one transaction. Defaults to True.
+
+    Returns
+    -------
+    bool
+        True if every track, artist and album was found, and linked to the
+        playlist, False if the playlist needs to be stored.
+    """
+    tracks = as_track_records(tracks)
+    artist_names, album_names = get_artist_and_album_names(tracks)
+    video_ids = {track.video_id for track in tracks if track.video_id}
+
+    complete = True
+    for key_column, keys in (
+        (Artist.name, artist_names),
+        (Album.name, album_names),
+        (Track.ytmusic_id, video_ids),
     ):
-        playlist_track = PlaylistTrack(
-            playlist_id=playlist_table_id,
-            track_id=track.id,
-            position=track_position_in_playlist,
+        ids = _resolve_ids(session, key_column, keys)
+        _mark_seen(session, key_column.class_, ids.values())
+        complete = complete and len(ids) == len(keys)
+
+    # `ids` now holds the ids of the tracks, resolved last
+    if complete and playlist_table_id is not None:
+        linked_track_ids = set(
+            session.scalars(
+                select(PlaylistTrack.track_id).where(
+                    PlaylistTrack.playlist_id == playlist_table_id
+                )
+            )
         )
-        session.add(playlist_track)
+        complete = linked_track_ids.issuperset(ids.values())
 
-    try:
+    if commit:
         session.commit()
-    except IntegrityError:
-        session.rollback()
+    return complete
 
 
-def store_user_saved_album(session, album_data):
-    """Store user-saved album information in the database.
+@registry.timed("db_call")
+def store_user_saved_albums(session, albums_data, commit=True):
+    """Store the user's saved albums and their artists in one batch.
 
-    Stores album and associated artists in the user's saved albums.
+    `albums_data` is treated as the complete list of saved albums, so albums
+    not in it are no longer marked as user saved.
 
     Parameters
     ----------
     session : sqlalchemy.orm.Session
-    album_data : dict
-        Dictionary containing album information, including `browseId`, `title`,
-        and `artists`.
+    albums_data : list of dict
+        List of album dictionaries, each including `title` and `artists`.
+    commit : bool, optional
+        Whether to commit once the rows are stored. Pass False to run several
+        stores in one transaction. Defaults to True.
     """
-    store_album_from_album_data(session, album_data, user_saved=True)
+    album_names = {
+        NO_ALBUM if album_data["title"] is None else album_data["title"]
+        for album_data in albums_data
+    }
+    artist_names = {
+        artist_data["name"]
+        for album_data in albums_data
+        for artist_data in album_data["artists"]
+    }
 
-    for artist_data in album_data["artists"]:
-        store_artist(session, artist_data["name"])
+    _store_names(session, Album.name, album_names, user_saved=True, exclusive=True)
+    store_artists(session, artist_names)
 
-    try:
+    if commit:
         session.commit()
-    except IntegrityError:
-        session.rollback()
 
 
-def store_artist(session, artist_name, user_saved=False):
-    """Store artist information in the database if not already present.
+@registry.timed("db_call")
+def get_albums_to_enrich(session, browse_ids):
+    """Return the albums that haven't been looked up with `get_album` yet.
 
     Parameters
     ----------
     session : sqlalchemy.orm.Session
-    artist_name : str
-    user_saved : bool, optional
-        Boolean label to use for the `user_saved` column of the `artists` table.
-        Defaults to False.
+    browse_ids : dict
+        Mapping of album name to browseId.
 
     Returns
     -------
-    Artist
-        The artist object stored in the database.
+    list of tuple
+        (id, browseId) of every album of `browse_ids` that is in the albums
+        table and not enriched, in id order.
     """
-    artist = session.query(Artist).filter_by(name=artist_name).first()
+    albums = []
+    for chunk in _chunked(browse_ids):
+        rows = session.execute(
+            select(Album.id, Album.name).where(
+                Album.name.in_(chunk), Album.enriched_at.is_(None)
+            )
+        )
+        albums += [(album_id, browse_ids[name]) for album_id, name in rows]
+    return sorted(albums)
 
-    # Add the artist if necessary
-    if not artist:
-        artist = Artist(name=artist_name, user_saved=user_saved)
-        session.add(artist)
-    # Update the user_saved info if necessary
-    elif user_saved and not artist.user_saved:
-        artist.user_saved = True
-    elif not user_saved and artist.user_saved:
-        artist.user_saved = False
 
-    session.commit()
+@registry.timed("db_call")
+def store_album_details(session, details, commit=True):
+    """Store the metadata of looked up albums and mark them enriched.
 
-    return artist
+    Parameters
+    ----------
+    session : sqlalchemy.orm.Session
+    details : list of dict
+        One dict per album, with the album's "id" in the albums table, its
+        "browse_id" and the "year", "track_count" and "duration_seconds"
+        returned by api_client.get_album_details.
+    commit : bool, optional
+        Whether to commit once the rows are stored. Defaults to True, which
+        checkpoints the albums so an interrupted run doesn't look them up
+        again.
+    """
+    if details:
+        enriched_at = datetime.now(timezone.utc)
+        session.execute(
+            update(Album),
+            [{**album, "enriched_at": enriched_at} for album in details],
+        )
+    if commit:
+        session.commit()
 
 
-def store_artist_from_artist_data(session, artist_data, user_saved=False):
-    """Store artist information in the database using artist data retrieved
-    using ytmusic api.
+@registry.timed("db_call")
+def store_artists_from_artist_data(
+    session, artists_data, user_saved=False, commit=True
+):
+    """Store many artists retrieved using ytmusic api in one batch.
 
     Parameters
     ----------
     session : sqlalchemy.orm.Session
-    artist_data : dict
-        Dictionary containing artist information, including `browseId` and
-        `artist` keys.
+    artists_data : list of dict
+        List of artist dictionaries, each including an `artist` key.
     user_saved : bool, optional
         Boolean label to use for the `user_saved` column of the `artists` table.
         Defaults to False.
+    commit : bool, optional
+        Whether to commit once the rows are stored. Pass False to run several
+        stores in one transaction. Defaults to True.
 
     Returns
     -------
-    Artist
-        The artist object stored in the database.
+    dict
+        Mapping of artist name to id in the artists table.
     """
-    artist = store_artist(session, artist_data["artist"], user_saved=user_saved)
+    artist_ids = store_artists(
+        session, {artist_data["artist"] for artist_data in artists_data}, user_saved
+    )
+
+    if commit:
+        session.commit()
+
+    return artist_ids
 
-    return artist
 
+@registry.timed("db_call")
+def store_subscribed_artists(session, subscriptions_data, commit=True):
+    """Store the artists the user is subscribed to in one batch.
 
-def get_all_ytmusic_ids_in_tracks_table(session):
-    """Return a list of all ytmusic_id values in the tracks table.
+    `subscriptions_data` is treated as the complete list of subscriptions, so
+    artists not in it are no longer marked as user saved.
 
     Parameters
     ----------
     session : sqlalchemy.orm.Session
+    subscriptions_data : list of dict
+        List of subscription dictionaries, each including `artist` and `type`
+        keys. Only subscriptions of type "artist" are stored.
+    commit : bool, optional
+        Whether to commit once the rows are stored. Pass False to run several
+        stores in one transaction. Defaults to True.
+
+    Returns
+    -------
+    dict
+        Mapping of artist name to id in the artists table.
     """
-    ytmusic_ids = session.query(Track.ytmusic_id).all()
-    ytmusic_ids_list = [ytmusic_id for (ytmusic_id,) in ytmusic_ids]
-    return ytmusic_ids_list
+    artist_names = {
+        subscription["artist"]
+        for subscription in subscriptions_data
+        if subscription["type"] == "artist"
+    }
+    artist_ids = _store_names(
+        session, Artist.name, artist_names, user_saved=True, exclusive=True
+    )
+
+    if commit:
+        session.commit()
 
+    return artist_ids
 
-def get_all_playlist_titles(session):
-    """Return a list of all the title values in the playlists table.
+
+def playlist_content_hash(tracks):
+    """Return a hash of the ordered videoIds of a playlist's tracks.
 
     Parameters
     ----------
-    session : sqlalchemy.orm.Session
+    tracks : list of dict or list of TrackRecord
+        List containing tracks, as returned by api_client.get_playlist_tracks,
+        or their `ytmb.records.TrackRecord`.
+
+    Returns
+    -------
+    str
+        Hex digest that changes whenever a track is added, removed or moved.
     """
-    titles = session.query(Playlist.title).all()
-    titles_list = [title for (title,) in titles]
-    return titles_list
+    video_ids = "\n".join(track.video_id or "" for track in as_track_records(tracks))
+    return hashlib.sha1(video_ids.encode()).hexdigest()
 
 
-def get_all_artist_names(session):
-    """Return a list of all the name values in the artists table.
+def get_playlist_sync_states(session):
+    """Return the change markers recorded for every synced playlist.
 
     Parameters
     ----------
     session : sqlalchemy.orm.Session
+
+    Returns
+    -------
+    dict
+        Mapping of playlist table id to a `(track_count, content_hash)` tuple.
     """
-    names = session.query(Artist.name).all()
-    names_list = [name for (name,) in names]
-    return names_list
+    rows = session.execute(
+        select(
+            PlaylistSyncState.playlist_id,
+            PlaylistSyncState.track_count,
+            PlaylistSyncState.content_hash,
+        )
+    )
+    return {
+        playlist_id: (count, content_hash) for playlist_id, count, content_hash in rows
+    }
 
 
-def get_all_album_names(session):
-    """Return a list of all the name values in the albums table.
+@registry.timed("db_call")
+def update_playlist_sync_state(
+    session, playlist_table_id, tracks, content_hash=None, commit=True
+):
+    """Record the change markers of a playlist after it has been stored.
 
     Parameters
     ----------
     session : sqlalchemy.orm.Session
+    playlist_table_id : int
+        The unique integer ID of the playlist in the playlists table of the
+        database.
+    tracks : list of dict or list of TrackRecord
+        The tracks that were stored for the playlist.
+    content_hash : str, optional
+        `playlist_content_hash(tracks)`, if already computed.
+    commit : bool, optional
+        Whether to commit once the rows are stored. Pass False to run several
+        stores in one transaction. Defaults to True.
     """
-    names = session.query(Album.name).all()
-    names_list = [name for (name,) in names]
-    return names_list
+    sync_state = session.scalars(
+        select(PlaylistSyncState).filter_by(playlist_id=playlist_table_id)
+    ).first()
+
+    if not sync_state:
+        sync_state = PlaylistSyncState(playlist_id=playlist_table_id)
+        session.add(sync_state)
+
+    sync_state.track_count = len(tracks)
+    sync_state.content_hash = (
+        playlist_content_hash(tracks) if content_hash is None else content_hash
+    )
+    sync_state.last_synced = datetime.now(timezone.utc)
+
+    if commit:
+        session.commit()
 
 
-def get_all_track_names(session):
-    """Return a list of all the name values in the tracks table.
+def has_ytmb_all_tracks(session, playlist_ytmusic_id):
+    """Return True if the membership of the ytmb-all playlist is recorded.
 
     Parameters
     ----------
     session : sqlalchemy.orm.Session
+    playlist_ytmusic_id : str
+
+    Returns
+    -------
+    bool
     """
-    names = session.query(Track.name).all()
-    names_list = [name for (name,) in names]
-    return names_list
+    return session.execute(
+        select(
+            select(YtmbAllTrack.id)
+            .where(YtmbAllTrack.playlist_ytmusic_id == playlist_ytmusic_id)
+            .exists()
+        )
+    ).scalar()
 
 
-def get_ytmusic_ids_for_playlist(session, playlist_name):
-    """Get ytmusic_id values of tracks in playlist.
+def get_ytmusic_ids_missing_from_ytmb_all(session, playlist_ytmusic_id):
+    """Return the ytmusic_id of every track not recorded in the ytmb-all playlist.
+
+    Computed in the database with a single anti-join of the tracks table
+    against the ytmb_all_tracks table, in track insertion order.
 
     Parameters
     ----------
     session : sqlalchemy.orm.Session
-    playlist_name : str
+    playlist_ytmusic_id : str
 
     Returns
     -------
     list
     """
-    ytmusic_ids = (
-        session.query(Track.ytmusic_id)
-        .join(PlaylistTrack, Track.id == PlaylistTrack.track_id)
-        .join(Playlist, Playlist.id == PlaylistTrack.playlist_id)
-        .filter(Playlist.title == playlist_name)
+    membership = select(YtmbAllTrack.id).where(
+        YtmbAllTrack.playlist_ytmusic_id == playlist_ytmusic_id,
+        YtmbAllTrack.ytmusic_id == Track.ytmusic_id,
+    )
+    return (
+        session.execute(
+            select(Track.ytmusic_id).where(~membership.exists()).order_by(Track.id)
+        )
+        .scalars()
         .all()
     )
 
-    ytmusic_ids_list = [ytmusic_id for (ytmusic_id,) in ytmusic_ids]
 
-    return ytmusic_ids_list
+def get_ytmb_all_tracks_to_remove(session, playlist_ytmusic_id):
+    """Return the tracks recorded in the ytmb-all playlist that are no longer in
+    the tracks table, and all but the first copy of tracks that are in the
+    playlist more than once.
 
-
-def identify_playlists_to_remove(session, library_playlists):
-    """
-    Compare a list of playlists to the list of playlists in the database and return the
-    difference.
+    Computed in the database with a single query. Tracks recorded without a
+    setVideoId can't be removed from the playlist and are left out.
 
     Parameters
     ----------
     session : sqlalchemy.orm.Session
-    library_playlists : list of dicts
-        List of library dictionaries. Each dict should have "name" key.
+    playlist_ytmusic_id : str
 
     Returns
     -------
-    set
-        The set of playlists in the database that are not in `library_playlists`.
+    list of dict
+        The "videoId" and "setVideoId" of each track, as expected by
+        `ytmb.api_client.remove_tracks_from_playlist`.
     """
-    library_playlist_titles = {p["name"] for p in library_playlists}
-    db_playlist_titles = set(get_all_playlist_titles(session))
-    playlists_to_remove = db_playlist_titles - library_playlist_titles
-    return playlists_to_remove
+    library = select(Track.id).where(Track.ytmusic_id == YtmbAllTrack.ytmusic_id)
+    earlier = aliased(YtmbAllTrack)
+    earlier_copy = select(earlier.id).where(
+        earlier.playlist_ytmusic_id == YtmbAllTrack.playlist_ytmusic_id,
+        earlier.ytmusic_id == YtmbAllTrack.ytmusic_id,
+        earlier.id < YtmbAllTrack.id,
+    )
+    rows = session.execute(
+        select(YtmbAllTrack.ytmusic_id, YtmbAllTrack.set_video_id)
+        .where(
+            YtmbAllTrack.playlist_ytmusic_id == playlist_ytmusic_id,
+            YtmbAllTrack.set_video_id.is_not(None),
+            ~library.exists() | earlier_copy.exists(),
+        )
+        .order_by(YtmbAllTrack.id)
+    )
+    return [
+        {"videoId": ytmusic_id, "setVideoId": set_video_id}
+        for ytmusic_id, set_video_id in rows
+    ]
+
 
+@registry.timed("db_call")
+def store_ytmb_all_tracks(session, playlist_ytmusic_id, ytmusic_ids, edit_results):
+    """Record tracks successfully added to the ytmb-all playlist and commit.
 
-def remove_playlists(session, playlists_to_remove):
-    """Remove playlists from the database.
+    Committing after every batch checkpoints the additions, so an interrupted
+    run doesn't add them again.
 
     Parameters
     ----------
     session : sqlalchemy.orm.Session
-    playlists_to_remove : list
-        List of playlist titles to remove from the database.
+    playlist_ytmusic_id : str
+    ytmusic_ids : list
+        videoIds sent in the `add_playlist_items` call.
+    edit_results : list
+        Dicts holding the setVideoId of each added videoId, e.g. the
+        "playlistEditResults" of the response. The setVideoId is needed to
+        remove the track later.
     """
-    for title in playlists_to_remove:
-        playlist = session.query(Playlist).filter_by(title=title).first()
-        if playlist:
-            session.delete(playlist)
+    set_video_ids = {
+        result["videoId"]: result.get("setVideoId")
+        for result in edit_results
+        if result and "videoId" in result
+    }
+    added_at = datetime.now(timezone.utc)
+    if ytmusic_ids:
+        session.execute(
+            insert(YtmbAllTrack),
+            [
+                {
+                    "playlist_ytmusic_id": playlist_ytmusic_id,
+                    "ytmusic_id": ytmusic_id,
+                    "set_video_id": set_video_ids.get(ytmusic_id),
+                    "added_at": added_at,
+                }
+                for ytmusic_id in ytmusic_ids
+            ],
+        )
     session.commit()
 
 
-def identify_artists_to_remove(session, library_artists):
-    """Compare a list of artists to the list of artists in the database and return the
-    difference.
+@registry.timed("db_call")
+def replace_ytmb_all_tracks(session, playlist_ytmusic_id, tracks):
+    """Replace the recorded membership of the ytmb-all playlist and commit.
 
     Parameters
     ----------
     session : sqlalchemy.orm.Session
-    library_artists : list
-        List of library artist names.
-
-    Returns
-    -------
-    set
-        The set of artists in the database that are not in `library_artists`.
+    playlist_ytmusic_id : str
+    tracks : list
+        Tracks of the playlist as returned by
+        `ytmb.api_client.get_playlist_tracks`. Tracks without a videoId are
+        skipped. Every copy of a track that is in the playlist more than once is
+        recorded with its own setVideoId, so the extra copies can be removed.
     """
-    db_artist_names = set(get_all_artist_names(session))
-    artists_to_remove = db_artist_names - library_artists
-    return artists_to_remove
+    session.execute(
+        delete(YtmbAllTrack).where(
+            YtmbAllTrack.playlist_ytmusic_id == playlist_ytmusic_id
+        )
+    )
+    added_at = datetime.now(timezone.utc)
+    rows = [
+        {
+            "playlist_ytmusic_id": playlist_ytmusic_id,
+            "ytmusic_id": track["videoId"],
+            "set_video_id": track.get("setVideoId"),
+            "added_at": added_at,
+        }
+        for track in tracks
+        if track.get("videoId")
+    ]
+    if rows:
+        session.execute(insert(YtmbAllTrack), rows)
+    session.commit()
 
 
-def remove_artists(session, artists_to_remove):
-    """Remove artists from the database.
+@registry.timed("db_call")
+def remove_ytmb_all_tracks(session, playlist_ytmusic_id, set_video_ids):
+    """Forget tracks removed from the ytmb-all playlist and commit.
 
     Parameters
     ----------
     session : sqlalchemy.orm.Session
-    artists_to_remove : list
-        List of artist names to remove from the database.
+    playlist_ytmusic_id : str
+    set_video_ids : list
+        setVideoIds of the removed tracks.
     """
-    for artist in artists_to_remove:
-        artist = session.query(Artist).filter_by(name=artist).first()
-        if artist:
-            session.delete(artist)
+    for chunk in _chunked(set_video_ids):
+        session.execute(
+            delete(YtmbAllTrack).where(
+                YtmbAllTrack.playlist_ytmusic_id == playlist_ytmusic_id,
+                YtmbAllTrack.set_video_id.in_(chunk),
+            )
+        )
     session.commit()
 
 
-def identify_albums_to_remove(session, library_albums):
-    """Compare a list of albums to the list of albums in the database and return the
-    difference.
+@registry.timed("db_call")
+def remove_unseen_rows(session, sync_run_id):
+    """Remove every playlist, artist, album and track not seen in a sync run.
+
+    Staleness is decided by row, using the `last_seen_run` column, so rows
+    sharing a name are handled independently. Each table is pruned with a
+    single `DELETE` whose dependent rows are deleted in bulk first, and
+    everything runs in one transaction.
 
     Parameters
     ----------
     session : sqlalchemy.orm.Session
-    library_albums : list
-        List of library album names.
+    sync_run_id : int
+        Id of the run, as returned by `start_sync_run`.
 
     Returns
     -------
-    albums_to_remove : set
-        The set of albums in the database that are not in `library_albums`.
+    dict
+        Mapping of table name to the number of rows deleted from it.
     """
-    db_album_titles = set(get_all_album_names(session))
-    albums_to_remove = db_album_titles - library_albums
-    return albums_to_remove
 
+    def unseen(model):
+        return model.last_seen_run.is_distinct_from(sync_run_id)
+
+    deleted = {}
+
+    # Seen tracks keep the album and artists they are linked to, even if those
+    # were renamed and their old names weren't seen
+    seen_track_ids = select(Track.id).where(Track.last_seen_run == sync_run_id)
+    for model, linked_ids in (
+        (Album, select(Track.album_id).where(Track.id.in_(seen_track_ids))),
+        (
+            Artist,
+            select(TrackArtist.artist_id).where(
+                TrackArtist.track_id.in_(seen_track_ids)
+            ),
+        ),
+    ):
+        session.execute(
+            update(model)
+            .where(model.id.in_(linked_ids), unseen(model))
+            .values(last_seen_run=sync_run_id)
+            .execution_options(synchronize_session=False)
+        )
 
-def remove_albums(session, albums_to_remove):
-    """Remove albums from the database.
+    playlist_ids = select(Playlist.id).where(unseen(Playlist))
+    _execute_delete(session, PlaylistTrack.playlist_id.in_(playlist_ids))
+    _execute_delete(session, PlaylistSyncState.playlist_id.in_(playlist_ids))
+    deleted["playlists"] = _execute_delete(session, unseen(Playlist))
 
-    Parameters
-    ----------
-    session : sqlalchemy.orm.Session
-    albums_to_remove : list
-        List of album names to remove from the database.
-    """
-    for album in albums_to_remove:
-        album = session.query(Album).filter_by(name=album).first()
-        if album:
-            session.delete(album)
+    # Only unseen tracks are deleted, so no seen track is left without its album
+    deleted["tracks"] = _delete_tracks(session, unseen(Track))
+
+    artist_ids = select(Artist.id).where(unseen(Artist))
+    _execute_delete(session, TrackArtist.artist_id.in_(artist_ids))
+    deleted["artists"] = _execute_delete(session, unseen(Artist))
+
+    deleted["albums"] = _execute_delete(session, unseen(Album))
+
+    _discard_identity_cache(session)
     session.commit()
 
+    return deleted
 
-def identify_tracks_to_remove(session, library_tracks):
-    """Compare a list of tracks in to the list of tracks in the database and return the
-    difference.
 
-    Parameters
-    ----------
-    session : sqlalchemy.orm.Session
-    library_tracks : list
-        List of library track names.
+def _execute_delete(session, criterion):
+    """Delete the rows of the table `criterion` refers to with one statement.
 
-    Returns
-    -------
-    tracks_to_remove : set
-        The set of tracks in the database that are not in `library_tracks`.
+    Returns the number of rows deleted.
     """
-    library_tracks = set(library_tracks)
-    db_track_titles = set(get_all_track_names(session))
-    tracks_to_remove = db_track_titles - library_tracks
-    return tracks_to_remove
+    table = criterion.left.table
+    result = session.execute(delete(table).where(criterion))
+    return result.rowcount
 
 
-def remove_tracks(session, tracks_to_remove):
-    """Remove tracks from the database.
+def _delete_tracks(session, criterion):
+    """Delete tracks matching `criterion` along with their links.
 
-    Parameters
-    ----------
-    session : sqlalchemy.orm.Session
-    tracks_to_remove : list
-        List of tracks to remove from the database.
+    Returns the number of tracks deleted.
     """
-    for track in tracks_to_remove:
-        track = session.query(Track).filter_by(name=track).first()
-        if track:
-            session.delete(track)
-    session.commit()
+    track_ids = select(Track.id).where(criterion)
+    _execute_delete(session, TrackArtist.track_id.in_(track_ids))
+    _execute_delete(session, PlaylistTrack.track_id.in_(track_ids))
+    return _execute_delete(session, criterion)
+
+
+def _discard_identity_cache(session):
+    """Detach the identity cache, which no longer matches the database once
+    rows have been deleted."""
+    session.info.pop(SESSION_INFO_KEY, None)
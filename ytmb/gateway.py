@@ -0,0 +1,276 @@
+import multiprocessing
+import random
+import re
+import threading
+import time
+from .metrics import registry
+
+# Default sustained request rate (calls per second) and burst size.
+DEFAULT_RATE = 5.0
+DEFAULT_BURST = 10
+
+# Attempts per call, including the first one.
+DEFAULT_MAX_ATTEMPTS = 5
+
+# Retries allowed across all calls of a run before errors are raised
+# immediately.
+DEFAULT_RETRY_BUDGET = 100
+
+# Base and maximum delay, in seconds, of the exponential backoff.
+BACKOFF_BASE = 0.5
+BACKOFF_CAP = 30.0
+
+_HTTP_STATUS_PATTERN = re.compile(r"HTTP (\d{3})")
+
+
+class TokenBucket:
+    """Thread-safe token bucket rate limiter.
+
+    Parameters
+    ----------
+    rate : float
+        Tokens added per second, i.e. the sustained number of calls per second.
+    burst : int
+        Maximum number of tokens held, i.e. the number of calls that can be made
+        back-to-back after a quiet period.
+    """
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = burst
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Take a token, sleeping until one is available."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(
+                    self.burst, self._tokens + (now - self._updated) * self.rate
+                )
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+class SharedTokenBucket(TokenBucket):
+    """Token bucket shared by several processes.
+
+    The tokens live in shared memory behind a process lock, so processes using
+    the same bucket make at most `rate` calls per second between them. Create
+    the bucket in the parent process and hand it to the worker processes when
+    they start, e.g. through the `initargs` of a `multiprocessing.Pool`.
+
+    Parameters
+    ----------
+    rate : float
+        Tokens added per second, shared by all processes.
+    burst : int
+        Maximum number of tokens held.
+    context : multiprocessing context, optional
+        Context the worker processes are started from. Defaults to the default
+        context.
+    """
+
+    def __init__(self, rate, burst, context=multiprocessing):
+        self.rate = rate
+        self.burst = burst
+        self._state = context.RawArray("d", [burst, time.monotonic()])
+        self._lock = context.Lock()
+
+    @property
+    def _tokens(self):
+        return self._state[0]
+
+    @_tokens.setter
+    def _tokens(self, value):
+        self._state[0] = value
+
+    @property
+    def _updated(self):
+        return self._state[1]
+
+    @_updated.setter
+    def _updated(self, value):
+        self._state[1] = value
+
+
+class EndpointStats:
+    """Latency and error counters of a single endpoint."""
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.retries = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+
+    def as_dict(self):
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "retries": self.retries,
+            "total_seconds": self.total_seconds,
+            "mean_seconds": self.total_seconds / self.calls if self.calls else 0.0,
+            "max_seconds": self.max_seconds,
+        }
+
+
+def is_transient_error(error, idempotent=True):
+    """Return True if `error` is worth retrying.
+
+    Connection errors, timeouts and HTTP 429 and 5xx responses are transient.
+    A non-idempotent call may have been applied by the server before a timeout
+    or 5xx response, so only HTTP 429 is transient for those.
+
+    Parameters
+    ----------
+    error : Exception
+    idempotent : bool, optional
+        Whether repeating the call is safe. Defaults to True.
+
+    Returns
+    -------
+    bool
+    """
+    # Imported here as they are only needed once a call has failed
+    import requests
+    from ytmusicapi.exceptions import YTMusicServerError
+
+    if isinstance(
+        error, (requests.exceptions.ConnectionError, requests.exceptions.Timeout)
+    ):
+        return idempotent
+    if isinstance(error, YTMusicServerError):
+        match = _HTTP_STATUS_PATTERN.search(str(error))
+        if match:
+            status = int(match.group(1))
+            return status == 429 or (idempotent and status >= 500)
+    return False
+
+
+class ApiGateway:
+    """Single entry point for calls to YouTube Music.
+
+    Every call waits for a token from a shared `TokenBucket`, is retried with
+    jittered exponential backoff on transient errors, and is recorded in
+    per-endpoint counters. Retries are drawn from a budget shared by all calls,
+    so a persistent outage fails the run instead of retrying forever.
+
+    Parameters
+    ----------
+    rate : float, optional
+        Sustained calls per second. Defaults to `DEFAULT_RATE`.
+    burst : int, optional
+        Burst size of the rate limiter. Defaults to `DEFAULT_BURST`.
+    max_attempts : int, optional
+        Attempts per call, including the first. Defaults to
+        `DEFAULT_MAX_ATTEMPTS`.
+    retry_budget : int, optional
+        Retries allowed across all calls. Defaults to `DEFAULT_RETRY_BUDGET`.
+    """
+
+    def __init__(
+        self,
+        rate=DEFAULT_RATE,
+        burst=DEFAULT_BURST,
+        max_attempts=DEFAULT_MAX_ATTEMPTS,
+        retry_budget=DEFAULT_RETRY_BUDGET,
+    ):
+        self.limiter = TokenBucket(rate, burst)
+        self.max_attempts = max_attempts
+        self.retry_budget = retry_budget
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    def _endpoint_stats(self, endpoint):
+        with self._lock:
+            return self._stats.setdefault(endpoint, EndpointStats())
+
+    def _take_retry(self):
+        with self._lock:
+            if self.retry_budget <= 0:
+                return False
+            self.retry_budget -= 1
+            return True
+
+    def call(self, endpoint, func, *args, idempotent=True, **kwargs):
+        """Call `func(*args, **kwargs)` under rate limiting and retries.
+
+        Parameters
+        ----------
+        endpoint : str
+            Name the call is recorded under, e.g. "get_playlist".
+        func : callable
+        idempotent : bool, optional
+            Whether repeating the call is safe. Calls that aren't, e.g.
+            playlist edits, are only retried when rate limited. Defaults to
+            True.
+
+        Returns
+        -------
+        Whatever `func` returns.
+
+        Raises
+        ------
+        Exception
+            The last error raised by `func`, if it is not transient or the
+            attempts or the retry budget are exhausted.
+        """
+        stats = self._endpoint_stats(endpoint)
+        attempt = 0
+        while True:
+            self.limiter.acquire()
+            start = time.perf_counter()
+            try:
+                result = func(*args, **kwargs)
+            except Exception as error:
+                failed = True
+                last_error = error
+            else:
+                failed = False
+            elapsed = time.perf_counter() - start
+
+            with self._lock:
+                stats.calls += 1
+                stats.total_seconds += elapsed
+                stats.max_seconds = max(stats.max_seconds, elapsed)
+                if failed:
+                    stats.errors += 1
+            if failed:
+                registry.increment("api_errors", endpoint=endpoint)
+
+            if not failed:
+                return result
+
+            attempt += 1
+            if (
+                attempt >= self.max_attempts
+                or not is_transient_error(last_error, idempotent=idempotent)
+                or not self._take_retry()
+            ):
+                raise last_error
+
+            with self._lock:
+                stats.retries += 1
+            registry.increment("api_retries", endpoint=endpoint)
+            time.sleep(random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * 2**attempt)))
+
+    def stats(self):
+        """Return the counters of every endpoint called so far.
+
+        Returns
+        -------
+        dict
+            Mapping of endpoint name to a dict with keys "calls", "errors",
+            "retries", "total_seconds", "mean_seconds" and "max_seconds".
+        """
+        with self._lock:
+            return {
+                endpoint: stats.as_dict() for endpoint, stats in self._stats.items()
+            }
@@ -1,31 +1,85 @@
 import argparse
+import json
+import math
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from sys import exit
 from tqdm import tqdm
 from ytmb.api_client import (
-    get_library_state,
+    DEFAULT_FETCH_WORKERS,
+    enable_response_cache,
+    get_all_albums,
+    get_all_artists,
+    get_all_playlists,
+    get_all_subscriptions,
+    get_gateway_stats,
     get_playlist_tracks,
+    set_rate_limit,
 )
-from ytmb.all_playlist import handle_ytmb_all_playlist
+from ytmb.accounts import DEFAULT_PROCESSES, load_manifest, print_report, sync_accounts
+from ytmb.albums import (
+    DEFAULT_ENRICH_WORKERS,
+    collect_album_browse_ids,
+    enrich_albums,
+)
+from ytmb.all_playlist import (
+    DEFAULT_BATCH_WORKERS,
+    DEFAULT_BATCH_SIZE,
+    handle_ytmb_all_playlist,
+)
+from ytmb.cache import attach_identity_cache
+from ytmb.config import get_cache_path, get_db_uri
+from ytmb.gateway import DEFAULT_RATE
+from ytmb.metrics import registry
+from ytmb.pipeline import Pipeline
+from ytmb.records import as_track_records
+from ytmb.response_cache import DEFAULT_MAX_BYTES
+from ytmb.search import SEARCHABLE_COLUMNS, rebuild_search_index, search
+from ytmb.summaries import refresh_summaries
 from ytmb.db import (
     Session,
-    identify_albums_to_remove,
-    identify_artists_to_remove,
-    identify_playlists_to_remove,
-    identify_tracks_to_remove,
+    finish_sync_run,
+    get_playlist_sync_states,
+    has_library,
     initialize_database,
-    remove_albums,
-    remove_artists,
-    remove_playlists,
-    remove_tracks,
+    mark_tracks_seen,
+    playlist_content_hash,
+    remove_unseen_rows,
+    start_sync_run,
+    store_artists_from_artist_data,
     store_playlists,
-    store_track_from_playlist,
-    store_user_saved_album,
-    store_artist_from_artist_data,
-    store_albums_from_tracks,
-    store_artists_from_tracks,
+    store_subscribed_artists,
+    store_tracks_from_playlist,
+    store_user_saved_albums,
+    update_playlist_sync_state,
 )
 
 
-def main():
+@contextmanager
+def _phase(pbar, description, session=None):
+    """Show `description` on the progress bar and time the enclosed phase.
+
+    If `session` is given, it is committed at the end of the phase, so the
+    phase's writes go to the database in one transaction.
+    """
+    pbar.set_description(description)
+    with registry.timer("phase", phase=description):
+        yield
+        if session is not None:
+            session.commit()
+    pbar.update()
+
+
+def _positive_float(value):
+    """argparse type accepting finite numbers greater than zero."""
+    number = float(value)
+    if not 0 < number < math.inf:
+        raise argparse.ArgumentTypeError(f"must be a positive number, got {value}")
+    return number
+
+
+def main(argv=None):
     parser = argparse.ArgumentParser()
     parser.add_argument(
         "-a",
@@ -33,87 +87,403 @@ def main():
         action="store_true",
         help="Create an amalgamation playlist of library music",
     )
-    args = parser.parse_args()
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=DEFAULT_BATCH_SIZE,
+        help="Number of tracks added to or removed from ytmb-all per request "
+        f"(default {DEFAULT_BATCH_SIZE})",
+    )
+    parser.add_argument(
+        "--add-workers",
+        type=int,
+        default=DEFAULT_BATCH_WORKERS,
+        help="Number of ytmb-all batches to send concurrently "
+        f"(default {DEFAULT_BATCH_WORKERS})",
+    )
+    parser.add_argument(
+        "--refresh-all-playlist",
+        action="store_true",
+        help="Download ytmb-all again instead of trusting the tracks YTMB recorded "
+        "adding to it",
+    )
+    parser.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="Print the number of tracks ytmb-all would gain and lose instead of "
+        "editing it",
+    )
+    parser.add_argument(
+        "-w",
+        "--workers",
+        type=int,
+        default=DEFAULT_FETCH_WORKERS,
+        help="Number of playlists to download concurrently "
+        f"(default {DEFAULT_FETCH_WORKERS})",
+    )
+    parser.add_argument(
+        "--full",
+        action="store_true",
+        help="Store every playlist, even those unchanged since the last run",
+    )
+    parser.add_argument(
+        "--no-album-enrichment",
+        action="store_true",
+        help="Don't look up the year, track count and duration of new albums",
+    )
+    parser.add_argument(
+        "--enrich-workers",
+        type=int,
+        default=DEFAULT_ENRICH_WORKERS,
+        help="Number of albums to look up concurrently "
+        f"(default {DEFAULT_ENRICH_WORKERS})",
+    )
+    parser.add_argument(
+        "--rate-limit",
+        type=_positive_float,
+        default=DEFAULT_RATE,
+        help=f"Maximum YouTube Music requests per second (default {DEFAULT_RATE})",
+    )
+    parser.add_argument(
+        "--cache-ttl",
+        type=float,
+        help="Serve YouTube Music responses younger than this many seconds from "
+        "the response cache at CACHE_PATH",
+    )
+    parser.add_argument(
+        "--cache-max-mb",
+        type=float,
+        default=DEFAULT_MAX_BYTES / 1024**2,
+        help="Size cap of the response cache in megabytes "
+        f"(default {DEFAULT_MAX_BYTES // 1024**2})",
+    )
+    parser.add_argument(
+        "--offline",
+        action="store_true",
+        help="Serve YouTube Music responses only from the response cache",
+    )
+    parser.add_argument(
+        "--metrics-out",
+        metavar="PATH",
+        help="Write a JSON report of per-phase timings and counters to PATH",
+    )
+    parser.add_argument(
+        "--metrics-prometheus",
+        metavar="PATH",
+        help="Also write the metrics to PATH in the Prometheus text format",
+    )
+    parser.add_argument(
+        "--no-progress",
+        action="store_true",
+        help="Don't show progress bars",
+    )
+    subparsers = parser.add_subparsers(dest="command")
+    search_parser = subparsers.add_parser(
+        "search", help="Search the backed up library by name"
+    )
+    search_parser.add_argument("term", nargs="+", help="Words to search for")
+    search_parser.add_argument(
+        "-k",
+        "--kind",
+        action="append",
+        choices=list(SEARCHABLE_COLUMNS),
+        help="Only return results of this kind. Can be repeated",
+    )
+    search_parser.add_argument(
+        "-n",
+        "--limit",
+        type=int,
+        default=20,
+        help="Maximum number of results (default 20)",
+    )
+    sync_all_parser = subparsers.add_parser(
+        "sync-all",
+        help="Back up several accounts listed in a manifest in parallel",
+    )
+    sync_all_parser.add_argument(
+        "manifest", help="JSON file listing the accounts, see ytmb.accounts"
+    )
+    sync_all_parser.add_argument(
+        "-j",
+        "--processes",
+        type=int,
+        default=DEFAULT_PROCESSES,
+        help="Maximum number of accounts synced at the same time "
+        f"(default {DEFAULT_PROCESSES}). --rate-limit is shared by all of them",
+    )
+    sync_all_parser.add_argument(
+        "--report",
+        metavar="PATH",
+        help="Also write the per-account report to PATH as JSON",
+    )
+    args = parser.parse_args(argv)
+    if args.dry_run and not args.all_playlist:
+        parser.error("--dry-run only applies to ytmb-all, so it needs --all-playlist")
+    if args.all_playlist and args.offline:
+        parser.error(
+            "--all-playlist can't be used with --offline, as ytmb-all is edited "
+            "on YouTube Music"
+        )
+
+    if args.command == "search":
+        search_library(args)
+    elif args.command == "sync-all":
+        unsupported = [
+            option
+            for option, value in (
+                ("--metrics-out", args.metrics_out),
+                ("--metrics-prometheus", args.metrics_prometheus),
+            )
+            if value is not None
+        ]
+        if unsupported:
+            parser.error(
+                f"{', '.join(unsupported)} can't be used with sync-all, as every "
+                "account would write the same file. Use --report instead"
+            )
+        sync_all(args, _sync_options(parser, args))
+    else:
+        sync(args)
+
+
+def search_library(args):
+    """Print the library items matching a search.
+
+    The database is only read, so it must have been synced before.
+    """
+    if not has_library():
+        print(
+            f"No backed up library at {get_db_uri()}. Check DB_URI or run ytmb to "
+            "back up the library first. Aborting."
+        )
+        exit(1)
+    session = Session()
+    results = search(session, " ".join(args.term), kinds=args.kind, limit=args.limit)
+    session.close()
+
+    if not results:
+        print("No results")
+    for kind, _, name in results:
+        print(f"{kind:<10}{name}")
+
+
+def _sync_options(parser, args):
+    """Return the top-level options of `args` that differ from their defaults,
+    as command line arguments.
+
+    `--rate-limit` and `--no-progress` are left out, as `sync_accounts` sets
+    them for every account.
+    """
+    argv = []
+    for action in parser._actions:
+        if (
+            not action.option_strings
+            or action.default == argparse.SUPPRESS
+            or action.dest in ("rate_limit", "no_progress")
+        ):
+            continue
+        value = getattr(args, action.dest)
+        if value == action.default:
+            continue
+        option = action.option_strings[-1]
+        argv += [option] if action.nargs == 0 else [option, str(value)]
+    return argv
+
+
+def sync_all(args, argv):
+    """Back up every account of a manifest and print an aggregate report.
+
+    `argv` holds the options passed to the sync of every account.
+    """
+    accounts = load_manifest(args.manifest)
+    start = time.perf_counter()
+    reports = []
+    for report in sync_accounts(
+        accounts, argv, processes=args.processes, rate=args.rate_limit
+    ):
+        status = "failed" if "error" in report else "done"
+        print(f"{report['name']}: {status} in {report['seconds']:.1f} s")
+        reports.append(report)
+    seconds = time.perf_counter() - start
+
+    print_report(reports, seconds)
+    if args.report:
+        with open(args.report, "w") as f:
+            json.dump({"seconds": seconds, "accounts": reports}, f, indent=2)
+    if any("error" in report for report in reports):
+        exit(1)
+
+
+def sync(args):
+    """Back up the YouTube Music library into the database."""
+    set_rate_limit(args.rate_limit)
+    if args.cache_ttl is not None or args.offline:
+        enable_response_cache(
+            get_cache_path(),
+            ttl=args.cache_ttl if args.cache_ttl is not None else float("inf"),
+            max_bytes=int(args.cache_max_mb * 1024**2),
+            offline_only=args.offline,
+        )
+
+    registry.reset()
+    start = time.perf_counter()
 
     initialize_database()
     session = Session()
+    identity_cache = attach_identity_cache(session)
+    sync_run_id = start_sync_run(session)
 
-    pbar = tqdm(total=8)
+    pbar = tqdm(total=11, disable=args.no_progress)
 
-    pbar.set_description("Getting YTMusic library")
-    playlists, library_albums, library_artists, library_subscriptions = (
-        get_library_state()
-    )
-    pbar.update()
-    all_artist_names = set.union(
-        set([a["artist"] for a in library_artists]),
-        set([a["artist"] for a in library_subscriptions]),
-    )
-    all_album_names = set([a["title"] for a in library_albums])
+    # The rest of the library is fetched while playlists are being stored
+    with ThreadPoolExecutor(max_workers=3) as library_fetcher:
+        with _phase(pbar, "Getting YTMusic library"):
+            playlists = get_all_playlists()
+            library_albums = library_fetcher.submit(get_all_albums)
+            library_artists = library_fetcher.submit(get_all_artists)
+            library_subscriptions = library_fetcher.submit(get_all_subscriptions)
 
-    all_track_titles = []
+        with _phase(pbar, "Storing playlists", session):
+            playlists = store_playlists(session, playlists, commit=False)
 
-    pbar.set_description("Storing playlists")
-    playlists = store_playlists(session, playlists)
-    pbar.update()
+        with _phase(pbar, "Storing playlist tracks", session):
+            playlists_by_id = {
+                p["ytmusic_id"]: p for p in playlists if p["name"] != "ytmb-all"
+            }
+            sync_states = {} if args.full else get_playlist_sync_states(session)
+            album_browse_ids = {}
 
-    pbar.set_description("Storing playlist tracks")
-    pbar_playlists = tqdm(playlists, position=1, leave=False)
-    for playlist in pbar_playlists:
-        pbar_playlists.set_description(playlist["name"])
-        if playlist["name"] == "ytmb-all":
-            continue
+            def fetch(playlist_id):
+                # Only compact records are kept, the raw tracks are freed right away
+                tracks = as_track_records(get_playlist_tracks(playlist_id))
+                return playlists_by_id[playlist_id], tracks
 
-        tracks = get_playlist_tracks(playlist["ytmusic_id"])
-        all_track_titles.extend([t["title"] for t in tracks])
+            def normalise(fetched):
+                playlist, tracks = fetched
+                content_hash = playlist_content_hash(tracks)
+                unchanged = sync_states.get(playlist["playlist_table_id"]) == (
+                    len(tracks),
+                    content_hash,
+                )
+                return playlist, tracks, content_hash, unchanged
 
-        artists = store_artists_from_tracks(session, tracks)
-        all_artist_names = set(all_artist_names).union(artists)
+            # Playlists are downloaded by a pool of fetchers, checked for changes by
+            # a normaliser and written here, with bounded queues in between
+            pipeline = (
+                Pipeline()
+                .add_stage("fetch", fetch, workers=args.workers)
+                .add_stage("normalise", normalise)
+            )
+            pbar_playlists = tqdm(
+                total=len(playlists_by_id),
+                position=1,
+                leave=False,
+                disable=args.no_progress,
+            )
+            for playlist, tracks, content_hash, unchanged in pipeline.run(
+                playlists_by_id
+            ):
+                pbar_playlists.set_description(playlist["name"])
+                collect_album_browse_ids(album_browse_ids, tracks=tracks)
 
-        albums = store_albums_from_tracks(session, tracks)
-        all_album_names = set(all_album_names).union(albums)
+                # An unchanged playlist only needs its contents kept from cleanup,
+                # unless some of them are missing from the database
+                if unchanged and mark_tracks_seen(
+                    session,
+                    tracks,
+                    playlist_table_id=playlist["playlist_table_id"],
+                    commit=False,
+                ):
+                    registry.increment("playlists_unchanged")
+                else:
+                    registry.increment("playlists_stored")
+                    store_tracks_from_playlist(
+                        session, playlist["playlist_table_id"], tracks, commit=False
+                    )
+                    update_playlist_sync_state(
+                        session,
+                        playlist["playlist_table_id"],
+                        tracks,
+                        content_hash=content_hash,
+                        commit=False,
+                    )
+                pbar_playlists.set_postfix(
+                    fetched=pipeline.counters["fetch"],
+                    normalised=pipeline.counters["normalise"],
+                )
+                pbar_playlists.update()
+            pbar_playlists.close()
 
-        for i, track in enumerate(tqdm(tracks, position=2, leave=False, desc="Tracks")):
-            store_track_from_playlist(session, playlist["playlist_table_id"], track, i)
+        with _phase(pbar, "Storing albums", session):
+            store_user_saved_albums(session, library_albums.result(), commit=False)
+            collect_album_browse_ids(
+                album_browse_ids, albums_data=library_albums.result()
+            )
 
-    pbar.update()
+        with _phase(pbar, "Storing artists", session):
+            store_artists_from_artist_data(
+                session, library_artists.result(), commit=False
+            )
 
-    pbar.set_description("Storing albums")
-    for album in tqdm(library_albums, position=1, leave=False):
-        store_user_saved_album(session, album)
-    pbar.update()
+        with _phase(pbar, "Storing subscriptions", session):
+            store_subscribed_artists(
+                session, library_subscriptions.result(), commit=False
+            )
 
-    pbar.set_description("Storing artists")
-    for artist in tqdm(library_artists, position=1, leave=False):
-        store_artist_from_artist_data(session, artist)
-    pbar.update()
+    with _phase(pbar, "Cleaning up database"):
+        remove_unseen_rows(session, sync_run_id)
 
-    pbar.set_description("Storing subscriptions")
-    for subscription in tqdm(library_subscriptions, position=1, leave=False):
-        if subscription["type"] == "artist":
-            store_artist_from_artist_data(session, subscription, user_saved=True)
-    pbar.update()
+    # After the cleanup, so albums that left the library aren't looked up
+    with _phase(pbar, "Enriching albums"):
+        if not args.no_album_enrichment:
+            enrich_albums(session, album_browse_ids, max_workers=args.enrich_workers)
 
-    if args.all_playlist:
-        pbar.set_description("Handling all-playlist")
-        handle_ytmb_all_playlist(playlists, session)
-    pbar.update()
+    # After the cleanup, so tracks that left the library leave ytmb-all too
+    with _phase(pbar, "Handling all-playlist"):
+        if args.all_playlist:
+            handle_ytmb_all_playlist(
+                playlists,
+                session,
+                batch_size=args.batch_size,
+                max_workers=args.add_workers,
+                refresh=args.refresh_all_playlist,
+                dry_run=args.dry_run,
+            )
 
-    pbar.set_description("Cleaning up database")
-    playlists_to_remove = identify_playlists_to_remove(session, playlists)
-    remove_playlists(session, playlists_to_remove)
-    artists_to_remove = identify_artists_to_remove(session, all_artist_names)
-    remove_artists(session, artists_to_remove)
-    albums_to_remove = identify_albums_to_remove(session, all_album_names)
-    remove_albums(session, albums_to_remove)
-    tracks_to_remove = identify_tracks_to_remove(session, all_track_titles)
-    remove_tracks(session, tracks_to_remove)
-    pbar.update()
+    with _phase(pbar, "Refreshing summaries"):
+        refresh_summaries(session)
+
+    with _phase(pbar, "Rebuilding search index"):
+        rebuild_search_index(session)
+
+    finish_sync_run(session, sync_run_id)
 
     session.close()
 
     pbar.close()
 
+    if args.metrics_out:
+        registry.write_json(
+            args.metrics_out,
+            sync_run_id=sync_run_id,
+            total_seconds=time.perf_counter() - start,
+            identity_cache=identity_cache.stats(),
+        )
+    if args.metrics_prometheus:
+        registry.write_prometheus(args.metrics_prometheus)
+
+    cache_stats = identity_cache.stats()
+    print(
+        f"Identity cache: {cache_stats['hit_rate']:.1%} hit rate over "
+        f"{cache_stats['hits'] + cache_stats['misses']} lookups, "
+        f"{cache_stats['entries']} entries (~{cache_stats['approx_bytes'] // 1024} KiB)"
+    )
+    api_stats = get_gateway_stats().values()
+    print(
+        f"API: {sum(s['calls'] for s in api_stats)} calls, "
+        f"{sum(s['retries'] for s in api_stats)} retries, "
+        f"{sum(s['errors'] for s in api_stats)} errors"
+    )
     print("Done")
 
 
@@ -0,0 +1,189 @@
+import functools
+import json
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+
+# Prefix of every metric name in Prometheus output.
+PROMETHEUS_PREFIX = "ytmb"
+
+_INVALID_NAME_CHARACTERS = re.compile(r"[^a-zA-Z0-9_]")
+
+
+class TimerStats:
+    """Call count and wall time of a timed block."""
+
+    def __init__(self):
+        self.count = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+
+    def as_dict(self):
+        return {
+            "count": self.count,
+            "total_seconds": self.total_seconds,
+            "mean_seconds": self.total_seconds / self.count if self.count else 0.0,
+            "max_seconds": self.max_seconds,
+        }
+
+
+class MetricsRegistry:
+    """Thread-safe registry of timers and counters.
+
+    Metrics are identified by a name and optional labels, e.g. the timer
+    "api_call" with label endpoint="get_playlist". Timers record how many times
+    a block ran and how long it took; counters accumulate arbitrary values such
+    as rows inserted or bytes received.
+    """
+
+    def __init__(self):
+        self._timers = {}
+        self._counters = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(name, labels):
+        return name, tuple(sorted(labels.items()))
+
+    def observe(self, name, seconds, **labels):
+        """Record one run of the timer `name` that took `seconds`."""
+        key = self._key(name, labels)
+        with self._lock:
+            stats = self._timers.get(key)
+            if stats is None:
+                stats = self._timers[key] = TimerStats()
+            stats.count += 1
+            stats.total_seconds += seconds
+            stats.max_seconds = max(stats.max_seconds, seconds)
+
+    @contextmanager
+    def timer(self, name, **labels):
+        """Time the enclosed block under the timer `name`.
+
+        The block is recorded even if it raises.
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def timed(self, name):
+        """Decorator timing every call of a function under the timer `name`,
+        labelled with the function's name."""
+
+        def decorator(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.timer(name, function=func.__name__):
+                    return func(*args, **kwargs)
+
+            return wrapper
+
+        return decorator
+
+    def increment(self, name, value=1, **labels):
+        """Add `value` to the counter `name`."""
+        key = self._key(name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def reset(self):
+        """Forget every metric recorded so far."""
+        with self._lock:
+            self._timers.clear()
+            self._counters.clear()
+
+    def report(self):
+        """Return every metric as JSON-serialisable data.
+
+        Returns
+        -------
+        dict
+            With keys "timers" and "counters", each a list of dicts with "name"
+            and "labels" keys. Timers also have the keys of
+            `TimerStats.as_dict`, counters have a "value" key.
+        """
+        with self._lock:
+            timers = [
+                {"name": name, "labels": dict(labels), **stats.as_dict()}
+                for (name, labels), stats in self._timers.items()
+            ]
+            counters = [
+                {"name": name, "labels": dict(labels), "value": value}
+                for (name, labels), value in self._counters.items()
+            ]
+        return {"timers": timers, "counters": counters}
+
+    def write_json(self, path, **extra):
+        """Write the report to `path` as JSON.
+
+        Parameters
+        ----------
+        path : str
+        **extra
+            Additional top-level entries of the report, e.g. run details.
+        """
+        with open(path, "w") as f:
+            json.dump({**extra, **self.report()}, f, indent=2)
+
+    def write_prometheus(self, path):
+        """Write the metrics to `path` in the Prometheus text format.
+
+        The file is replaced atomically, so it can be read by the node_exporter
+        textfile collector while a run is in progress.
+
+        Parameters
+        ----------
+        path : str
+        """
+        report = self.report()
+        samples = {}
+        for timer in report["timers"]:
+            name = _prometheus_name(timer["name"])
+            labels = _prometheus_labels(timer["labels"])
+            samples.setdefault(f"{name}_calls_total", []).append(
+                (labels, timer["count"])
+            )
+            samples.setdefault(f"{name}_seconds_total", []).append(
+                (labels, timer["total_seconds"])
+            )
+        for counter in report["counters"]:
+            name = _prometheus_name(counter["name"])
+            samples.setdefault(f"{name}_total", []).append(
+                (_prometheus_labels(counter["labels"]), counter["value"])
+            )
+
+        lines = []
+        for name, values in samples.items():
+            lines.append(f"# TYPE {name} counter")
+            lines.extend(f"{name}{labels} {value}" for labels, value in values)
+
+        temporary_path = f"{path}.tmp"
+        with open(temporary_path, "w") as f:
+            f.write("\n".join(lines) + "\n")
+        os.replace(temporary_path, path)
+
+
+def _prometheus_name(name):
+    return f"{PROMETHEUS_PREFIX}_{_INVALID_NAME_CHARACTERS.sub('_', name)}"
+
+
+def _prometheus_labels(labels):
+    if not labels:
+        return ""
+    pairs = ",".join(
+        f'{_INVALID_NAME_CHARACTERS.sub("_", key)}="{_escape_label(value)}"'
+        for key, value in labels.items()
+    )
+    return f"{{{pairs}}}"
+
+
+def _escape_label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+# Registry shared by the whole sync pipeline.
+registry = MetricsRegistry()
@@ -1,4 +1,13 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, UniqueConstraint, Boolean
+from sqlalchemy import (
+    Column,
+    Integer,
+    String,
+    ForeignKey,
+    UniqueConstraint,
+    Index,
+    Boolean,
+    DateTime,
+)
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
 
@@ -9,8 +18,9 @@ class Artist(Base):
     __tablename__ = "artists"
 
     id = Column(Integer, primary_key=True, autoincrement=True)
-    name = Column(String, nullable=False)
+    name = Column(String, nullable=False, unique=True, index=True)
     user_saved = Column(Boolean, nullable=False, default=False)
+    last_seen_run = Column(Integer)
 
     tracks = relationship(
         "TrackArtist", back_populates="artist", cascade="all, delete-orphan"
@@ -23,7 +33,8 @@ class Track(Base):
     id = Column(Integer, primary_key=True, autoincrement=True)
     name = Column(String, nullable=False)
     ytmusic_id = Column(String, unique=True, nullable=False)
-    album_id = Column(Integer, ForeignKey("albums.id"), nullable=False)
+    album_id = Column(Integer, ForeignKey("albums.id"), nullable=False, index=True)
+    last_seen_run = Column(Integer)
 
     artists = relationship(
         "TrackArtist", back_populates="track", cascade="all, delete-orphan"
@@ -37,8 +48,16 @@ class Album(Base):
     __tablename__ = "albums"
 
     id = Column(Integer, primary_key=True, autoincrement=True)
-    name = Column(String, nullable=False)
+    name = Column(String, nullable=False, unique=True, index=True)
     user_saved = Column(Boolean, nullable=False, default=False)
+    last_seen_run = Column(Integer)
+    # Filled in from `get_album` by album enrichment. `enriched_at` is null until
+    # the album has been looked up.
+    browse_id = Column(String, index=True)
+    year = Column(Integer)
+    track_count = Column(Integer)
+    duration_seconds = Column(Integer)
+    enriched_at = Column(DateTime)
 
     tracks = relationship("Track", backref="album", cascade="all, delete-orphan")
 
@@ -47,11 +66,18 @@ class Playlist(Base):
     __tablename__ = "playlists"
 
     id = Column(Integer, primary_key=True, autoincrement=True)
-    title = Column(String, nullable=False)
+    title = Column(String, nullable=False, index=True)
+    last_seen_run = Column(Integer)
 
     playlist_tracks = relationship(
         "PlaylistTrack", back_populates="playlist", cascade="all, delete-orphan"
     )
+    sync_state = relationship(
+        "PlaylistSyncState",
+        back_populates="playlist",
+        uselist=False,
+        cascade="all, delete-orphan",
+    )
 
 
 class TrackArtist(Base):
@@ -60,7 +86,7 @@ class TrackArtist(Base):
 
     id = Column(Integer, primary_key=True, autoincrement=True)
     artist_id = Column(Integer, ForeignKey("artists.id"), nullable=False)
-    track_id = Column(Integer, ForeignKey("tracks.id"), nullable=False)
+    track_id = Column(Integer, ForeignKey("tracks.id"), nullable=False, index=True)
 
     artist = relationship("Artist", back_populates="tracks")
     track = relationship("Track", back_populates="artists")
@@ -72,8 +98,96 @@ class PlaylistTrack(Base):
 
     id = Column(Integer, primary_key=True, autoincrement=True)
     playlist_id = Column(Integer, ForeignKey("playlists.id"), nullable=False)
-    track_id = Column(Integer, ForeignKey("tracks.id"), nullable=False)
+    track_id = Column(Integer, ForeignKey("tracks.id"), nullable=False, index=True)
     position = Column(Integer, nullable=False)
 
     playlist = relationship("Playlist", back_populates="playlist_tracks")
     track = relationship("Track", back_populates="playlist_tracks")
+
+
+class PlaylistSyncState(Base):
+    __tablename__ = "playlist_sync_state"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    playlist_id = Column(
+        Integer, ForeignKey("playlists.id"), unique=True, nullable=False
+    )
+    track_count = Column(Integer, nullable=False)
+    content_hash = Column(String, nullable=False)
+    last_synced = Column(DateTime, nullable=False)
+
+    playlist = relationship("Playlist", back_populates="sync_state")
+
+
+class SyncRun(Base):
+    __tablename__ = "sync_runs"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    started_at = Column(DateTime, nullable=False)
+    finished_at = Column(DateTime)
+
+
+class ArtistSummary(Base):
+    __tablename__ = "artist_summaries"
+
+    artist_id = Column(Integer, primary_key=True)
+    name = Column(String, nullable=False, index=True)
+    user_saved = Column(Boolean, nullable=False)
+    track_count = Column(Integer, nullable=False)
+    album_count = Column(Integer, nullable=False)
+
+
+class AlbumSummary(Base):
+    __tablename__ = "album_summaries"
+
+    album_id = Column(Integer, primary_key=True)
+    name = Column(String, nullable=False, index=True)
+    user_saved = Column(Boolean, nullable=False)
+    artists = Column(String)
+    artist_count = Column(Integer, nullable=False)
+    track_count = Column(Integer, nullable=False)
+
+
+class ArtistAlbumSummary(Base):
+    __tablename__ = "artist_album_summaries"
+
+    artist_id = Column(Integer, primary_key=True)
+    album_id = Column(Integer, primary_key=True)
+    track_count = Column(Integer, nullable=False)
+
+
+class PlaylistSummary(Base):
+    __tablename__ = "playlist_summaries"
+
+    playlist_id = Column(Integer, primary_key=True)
+    title = Column(String, nullable=False, index=True)
+    track_count = Column(Integer, nullable=False)
+
+
+class LibraryTotals(Base):
+    __tablename__ = "library_totals"
+
+    id = Column(Integer, primary_key=True)
+    artists = Column(Integer, nullable=False)
+    tracks = Column(Integer, nullable=False)
+    albums = Column(Integer, nullable=False)
+    playlists = Column(Integer, nullable=False)
+    user_saved_artists = Column(Integer, nullable=False)
+    user_saved_albums = Column(Integer, nullable=False)
+    refreshed_at = Column(DateTime, nullable=False)
+
+
+class YtmbAllTrack(Base):
+    __tablename__ = "ytmb_all_tracks"
+    # A track can be in the playlist more than once, each copy with its own
+    # setVideoId
+    __table_args__ = (
+        UniqueConstraint("playlist_ytmusic_id", "set_video_id"),
+        Index("ix_ytmb_all_tracks_ytmusic_id", "playlist_ytmusic_id", "ytmusic_id"),
+    )
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    playlist_ytmusic_id = Column(String, nullable=False)
+    ytmusic_id = Column(String, nullable=False)
+    set_video_id = Column(String)
+    added_at = Column(DateTime, nullable=False)
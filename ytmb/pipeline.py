@@ -0,0 +1,172 @@
+import queue
+import threading
+
+# Default number of items each queue between two stages can hold.
+DEFAULT_QUEUE_SIZE = 8
+
+# Seconds a blocked stage waits before checking whether the pipeline stopped.
+_POLL_INTERVAL = 0.1
+
+_DONE = object()
+
+
+class Pipeline:
+    """Stages of worker threads connected by bounded queues.
+
+    Items are fed to the first stage and every stage passes the results of its
+    function on to the next one. The results of the last stage are returned to
+    the caller of `run` as they come out. As queues are bounded, a stage that
+    falls behind blocks the stages before it, so no more than about
+    `queue_size` items per queue, plus those being worked on, are held in
+    memory at any time. Results come out in completion order.
+
+    The number of items each stage has finished is kept in `counters`, e.g. to
+    drive progress bars.
+
+    Parameters
+    ----------
+    queue_size : int, optional
+        Capacity of each queue. Defaults to `DEFAULT_QUEUE_SIZE`.
+
+    Attributes
+    ----------
+    counters : dict
+        Mapping of stage name to the number of items it has finished.
+    """
+
+    def __init__(self, queue_size=DEFAULT_QUEUE_SIZE):
+        self.queue_size = queue_size
+        self.counters = {}
+        self._stages = []
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._error = None
+
+    def add_stage(self, name, func, workers=1):
+        """Append a stage running `func(item)` on `workers` threads.
+
+        Parameters
+        ----------
+        name : str
+        func : callable
+            Called with each item from the previous stage. Its return value is
+            passed on to the next stage.
+        workers : int, optional
+            Number of threads running the stage. Defaults to 1.
+
+        Returns
+        -------
+        Pipeline
+            The pipeline itself, so calls can be chained.
+        """
+        self._stages.append((name, func, workers))
+        self.counters[name] = 0
+        return self
+
+    def _put(self, q, item):
+        while not self._stopped.is_set():
+            try:
+                q.put(item, timeout=_POLL_INTERVAL)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _get(self, q):
+        while not self._stopped.is_set():
+            try:
+                return q.get(timeout=_POLL_INTERVAL)
+            except queue.Empty:
+                continue
+        return _DONE
+
+    def _fail(self, error):
+        with self._lock:
+            if self._error is None:
+                self._error = error
+        self._stopped.set()
+
+    def _feed(self, items, q):
+        try:
+            for item in items:
+                if not self._put(q, item):
+                    return
+        except Exception as error:
+            self._fail(error)
+            return
+        self._put(q, _DONE)
+
+    def _work(self, name, func, q_in, q_out, remaining):
+        while True:
+            item = self._get(q_in)
+            if item is _DONE:
+                # Let the other workers of the stage see the end too
+                self._put(q_in, _DONE)
+                with self._lock:
+                    remaining[0] -= 1
+                    last = remaining[0] == 0
+                if last:
+                    self._put(q_out, _DONE)
+                return
+            try:
+                result = func(item)
+            except Exception as error:
+                self._fail(error)
+                return
+            with self._lock:
+                self.counters[name] += 1
+            if not self._put(q_out, result):
+                return
+
+    def run(self, items):
+        """Run `items` through the stages.
+
+        Parameters
+        ----------
+        items : iterable
+
+        Yields
+        ------
+        The results of the last stage.
+
+        Raises
+        ------
+        Exception
+            The first error raised by a stage function or by `items`. The
+            other stages are stopped first.
+        """
+        self._stopped.clear()
+        self._error = None
+        for name in self.counters:
+            self.counters[name] = 0
+
+        queues = [queue.Queue(self.queue_size) for _ in range(len(self._stages) + 1)]
+        threads = [
+            threading.Thread(target=self._feed, args=(items, queues[0]), daemon=True)
+        ]
+        for i, (name, func, workers) in enumerate(self._stages):
+            remaining = [workers]
+            threads += [
+                threading.Thread(
+                    target=self._work,
+                    args=(name, func, queues[i], queues[i + 1], remaining),
+                    daemon=True,
+                )
+                for _ in range(workers)
+            ]
+        for thread in threads:
+            thread.start()
+
+        try:
+            while True:
+                result = self._get(queues[-1])
+                if result is _DONE:
+                    break
+                yield result
+        finally:
+            self._stopped.set()
+            for thread in threads:
+                thread.join()
+
+        if self._error is not None:
+            raise self._error
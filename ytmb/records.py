@@ -0,0 +1,59 @@
+import sys
+from collections import namedtuple
+
+# The parts of a ytmusicapi track that are stored. `album` is the album name, or
+# None for tracks without an album, `album_id` its browseId, if known, and
+# `artists` is a tuple of artist names.
+TrackRecord = namedtuple(
+    "TrackRecord", ["video_id", "title", "album", "album_id", "artists"]
+)
+
+
+def _intern(value):
+    return None if value is None else sys.intern(value)
+
+
+def track_record(track_data):
+    """Turn a track returned by ytmusicapi into a `TrackRecord`.
+
+    Artist and album names are interned, so every record of the same artist or
+    album shares one string.
+
+    Parameters
+    ----------
+    track_data : dict
+        A track, as returned by api_client.get_playlist_tracks.
+
+    Returns
+    -------
+    TrackRecord
+    """
+    album = track_data.get("album")
+    return TrackRecord(
+        video_id=track_data.get("videoId"),
+        title=track_data.get("title"),
+        album=None if album is None else _intern(album["name"]),
+        album_id=None if album is None else _intern(album.get("id")),
+        artists=tuple(
+            _intern(artist["name"]) for artist in track_data.get("artists") or ()
+        ),
+    )
+
+
+def as_track_records(tracks):
+    """Return `tracks` as a list of `TrackRecord`.
+
+    Parameters
+    ----------
+    tracks : list
+        Tracks as returned by api_client.get_playlist_tracks, or records
+        already.
+
+    Returns
+    -------
+    list of TrackRecord
+    """
+    return [
+        track if isinstance(track, TrackRecord) else track_record(track)
+        for track in tracks
+    ]
@@ -0,0 +1,131 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+import zlib
+
+# Default size cap of the cache, in bytes of compressed payload.
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+
+class CacheMissError(LookupError):
+    """Raised when a response is needed in offline mode but is not cached."""
+
+
+class ResponseCache:
+    """Persistent cache of YouTube Music API responses.
+
+    Responses are stored as zlib-compressed JSON in a standalone SQLite file,
+    keyed by endpoint name and call arguments. Entries older than `ttl` are
+    ignored, and the least recently used entries are evicted once the total
+    compressed size exceeds `max_bytes`. Safe to use from several threads.
+
+    Parameters
+    ----------
+    path : str
+        Path of the SQLite file. Created if it doesn't exist.
+    ttl : float
+        Maximum age, in seconds, of an entry served by `get`.
+    max_bytes : int, optional
+        Size cap of the cache. Defaults to `DEFAULT_MAX_BYTES`.
+    """
+
+    def __init__(self, path, ttl, max_bytes=DEFAULT_MAX_BYTES):
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, "
+            "endpoint TEXT NOT NULL, "
+            "payload BLOB NOT NULL, "
+            "size INTEGER NOT NULL, "
+            "created_at REAL NOT NULL, "
+            "accessed_at REAL NOT NULL)"
+        )
+        self._connection.execute(
+            "CREATE INDEX IF NOT EXISTS ix_responses_accessed_at "
+            "ON responses (accessed_at)"
+        )
+        self._connection.commit()
+
+    @staticmethod
+    def _key(endpoint, args, kwargs):
+        arguments = json.dumps([args, kwargs], sort_keys=True, default=str)
+        return hashlib.sha256(f"{endpoint}:{arguments}".encode()).hexdigest()
+
+    def get(self, endpoint, args, kwargs, default=None, ignore_ttl=False):
+        """Return the cached response of a call, or `default`.
+
+        Parameters
+        ----------
+        endpoint : str
+        args : tuple
+        kwargs : dict
+        default : optional
+            Returned if there is no fresh entry. Defaults to None.
+        ignore_ttl : bool, optional
+            If True, serve entries regardless of their age. Defaults to False.
+        """
+        key = self._key(endpoint, args, kwargs)
+        now = time.time()
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT payload, created_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or (not ignore_ttl and now - row[1] > self.ttl):
+                self.misses += 1
+                return default
+            self._connection.execute(
+                "UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key)
+            )
+            self._connection.commit()
+            self.hits += 1
+        return json.loads(zlib.decompress(row[0]))
+
+    def put(self, endpoint, args, kwargs, response):
+        """Store the response of a call, evicting old entries if necessary.
+
+        Parameters
+        ----------
+        endpoint : str
+        args : tuple
+        kwargs : dict
+        response
+            JSON-serialisable response.
+        """
+        key = self._key(endpoint, args, kwargs)
+        payload = zlib.compress(json.dumps(response).encode())
+        now = time.time()
+        with self._lock:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?)",
+                (key, endpoint, payload, len(payload), now, now),
+            )
+            self._evict()
+            self._connection.commit()
+
+    def _evict(self):
+        (total,) = self._connection.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM responses"
+        ).fetchone()
+        if total <= self.max_bytes:
+            return
+        rows = self._connection.execute(
+            "SELECT key, size FROM responses ORDER BY accessed_at"
+        )
+        evicted = []
+        for key, size in rows:
+            if total <= self.max_bytes:
+                break
+            evicted.append((key,))
+            total -= size
+        self._connection.executemany("DELETE FROM responses WHERE key = ?", evicted)
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
@@ -0,0 +1,181 @@
+from sqlalchemy import Integer, String, func, literal, select, text, union_all
+from sqlalchemy.exc import OperationalError
+from .models import Album, Artist, Playlist, Track
+
+# Name column searched for each kind of result.
+SEARCHABLE_COLUMNS = {
+    "track": Track.name,
+    "artist": Artist.name,
+    "album": Album.name,
+    "playlist": Playlist.title,
+}
+
+SEARCH_INDEX_TABLE = "search_index"
+
+
+def _uses_sqlite(session):
+    return session.get_bind().dialect.name == "sqlite"
+
+
+def rebuild_search_index(session):
+    """Rebuild the full-text search index from the library tables.
+
+    The index is an SQLite FTS5 table of the names of every track, artist,
+    album and playlist. It is rebuilt from scratch, which takes a fraction of
+    a second even for large libraries. Does nothing on other databases, or if
+    SQLite was built without FTS5.
+
+    Parameters
+    ----------
+    session : sqlalchemy.orm.Session
+
+    Returns
+    -------
+    bool
+        True if the index was rebuilt.
+    """
+    if not _uses_sqlite(session):
+        return False
+    try:
+        session.execute(
+            text(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {SEARCH_INDEX_TABLE} USING fts5("
+                "kind UNINDEXED, item_id UNINDEXED, name, "
+                "tokenize = 'unicode61 remove_diacritics 2')"
+            )
+        )
+    except OperationalError:
+        session.rollback()
+        return False
+
+    session.execute(text(f"DELETE FROM {SEARCH_INDEX_TABLE}"))
+    for kind, column in SEARCHABLE_COLUMNS.items():
+        session.execute(
+            text(
+                f"INSERT INTO {SEARCH_INDEX_TABLE} (kind, item_id, name) "
+                f"SELECT :kind, id, {column.key} FROM {column.table.name}"
+            ),
+            {"kind": kind},
+        )
+    session.commit()
+    return True
+
+
+def has_search_index(session):
+    """Return True if the full-text search index exists."""
+    if not _uses_sqlite(session):
+        return False
+    return (
+        session.execute(
+            text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"),
+            {"name": SEARCH_INDEX_TABLE},
+        ).first()
+        is not None
+    )
+
+
+def fts_query(term):
+    """Turn free text into an FTS5 query matching rows that contain words
+    starting with every word of `term`.
+
+    Returns None if `term` has no words.
+    """
+    words = term.split()
+    if not words:
+        return None
+    return " ".join('"{}"*'.format(word.replace('"', '""')) for word in words)
+
+
+def matching_ids(session, kind, term):
+    """Return a SELECT of the ids of the `kind` rows matching `term`.
+
+    Uses the full-text search index if it exists, matching words by prefix.
+    Otherwise falls back to a case-insensitive substring match on the name.
+
+    Parameters
+    ----------
+    session : sqlalchemy.orm.Session
+    kind : str
+        One of the keys of `SEARCHABLE_COLUMNS`.
+    term : str
+
+    Returns
+    -------
+    sqlalchemy.sql.expression.Selectable
+        A single-column query, e.g. for use with `Track.id.in_()`.
+    """
+    column = SEARCHABLE_COLUMNS[kind]
+    query = fts_query(term)
+    if query is None or not has_search_index(session):
+        return select(column.table.c.id).where(column.ilike(f"%{term.strip()}%"))
+    return (
+        text(
+            f"SELECT item_id FROM {SEARCH_INDEX_TABLE} "
+            f"WHERE {SEARCH_INDEX_TABLE} MATCH :query AND kind = :kind"
+        )
+        .bindparams(query=query, kind=kind)
+        .columns(item_id=Integer)
+    )
+
+
+def search(session, term, kinds=None, limit=50):
+    """Search the library by name.
+
+    With the full-text search index, words of `term` match by prefix anywhere
+    in a name and results are ranked by relevance (BM25). Without it, results
+    are names containing `term`, shortest first.
+
+    Parameters
+    ----------
+    session : sqlalchemy.orm.Session
+    term : str
+    kinds : iterable of str, optional
+        Kinds of results to return, keys of `SEARCHABLE_COLUMNS`. Defaults to
+        all of them.
+    limit : int, optional
+        Maximum number of results. Defaults to 50.
+
+    Returns
+    -------
+    list of tuple
+        (kind, id, name) of each result, best match first.
+    """
+    kinds = list(SEARCHABLE_COLUMNS if kinds is None else kinds)
+    query = fts_query(term)
+    if query is None or not kinds:
+        return []
+
+    if has_search_index(session):
+        kind_placeholders = ", ".join(f":kind_{i}" for i in range(len(kinds)))
+        rows = session.execute(
+            text(
+                f"SELECT kind, item_id, name FROM {SEARCH_INDEX_TABLE} "
+                f"WHERE {SEARCH_INDEX_TABLE} MATCH :query "
+                f"AND kind IN ({kind_placeholders}) "
+                f"ORDER BY bm25({SEARCH_INDEX_TABLE}) LIMIT :limit"
+            ),
+            {
+                "query": query,
+                "limit": limit,
+                **{f"kind_{i}": kind for i, kind in enumerate(kinds)},
+            },
+        )
+        return [tuple(row) for row in rows]
+
+    pattern = f"%{term.strip()}%"
+    matches = union_all(
+        *(
+            select(
+                literal(kind, String).label("kind"),
+                SEARCHABLE_COLUMNS[kind].table.c.id.label("id"),
+                SEARCHABLE_COLUMNS[kind].label("name"),
+            ).where(SEARCHABLE_COLUMNS[kind].ilike(pattern))
+            for kind in kinds
+        )
+    ).subquery()
+    rows = session.execute(
+        select(matches)
+        .order_by(func.length(matches.c.name), matches.c.name)
+        .limit(limit)
+    )
+    return [tuple(row) for row in rows]
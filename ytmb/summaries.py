@@ -0,0 +1,159 @@
+from datetime import datetime, timezone
+from sqlalchemy import delete, distinct, func, insert, inspect, literal, select
+from .models import (
+    Album,
+    AlbumSummary,
+    Artist,
+    ArtistAlbumSummary,
+    ArtistSummary,
+    LibraryTotals,
+    Playlist,
+    PlaylistSummary,
+    PlaylistTrack,
+    Track,
+    TrackArtist,
+)
+
+SUMMARY_MODELS = (
+    ArtistSummary,
+    AlbumSummary,
+    ArtistAlbumSummary,
+    PlaylistSummary,
+    LibraryTotals,
+)
+
+
+def string_agg(session, column):
+    """Return an aggregate of `column` values joined with ", ".
+
+    Uses GROUP_CONCAT, or string_agg on PostgreSQL.
+    """
+    if session.get_bind().dialect.name == "postgresql":
+        return func.string_agg(column, literal(", "))
+    return func.group_concat(column, ", ")
+
+
+def refresh_summaries(session):
+    """Rebuild the summary tables from the library tables.
+
+    The summary tables hold the aggregates shown by the database browser:
+    per-artist track and album counts, per-album artists and track counts,
+    per-artist-and-album track counts, per-playlist track counts and library
+    totals. Each table is replaced with a single INSERT ... SELECT, in one
+    transaction.
+
+    Parameters
+    ----------
+    session : sqlalchemy.orm.Session
+    """
+    for model in SUMMARY_MODELS:
+        session.execute(delete(model))
+
+    artist_tracks = (
+        select(
+            TrackArtist.artist_id,
+            func.count(TrackArtist.track_id).label("tracks"),
+            func.count(distinct(Track.album_id)).label("albums"),
+        )
+        .join(Track, Track.id == TrackArtist.track_id)
+        .group_by(TrackArtist.artist_id)
+        .subquery()
+    )
+    session.execute(
+        insert(ArtistSummary).from_select(
+            ["artist_id", "name", "user_saved", "track_count", "album_count"],
+            select(
+                Artist.id,
+                Artist.name,
+                Artist.user_saved,
+                func.coalesce(artist_tracks.c.tracks, 0),
+                func.coalesce(artist_tracks.c.albums, 0),
+            ).outerjoin(artist_tracks, artist_tracks.c.artist_id == Artist.id),
+        )
+    )
+
+    session.execute(
+        insert(ArtistAlbumSummary).from_select(
+            ["artist_id", "album_id", "track_count"],
+            select(TrackArtist.artist_id, Track.album_id, func.count())
+            .join(Track, Track.id == TrackArtist.track_id)
+            .group_by(TrackArtist.artist_id, Track.album_id),
+        )
+    )
+
+    album_artists = (
+        select(Track.album_id, Artist.name)
+        .join(TrackArtist, TrackArtist.track_id == Track.id)
+        .join(Artist, Artist.id == TrackArtist.artist_id)
+        .distinct()
+        .order_by(Artist.name)
+        .subquery()
+    )
+    artist_names = (
+        select(
+            album_artists.c.album_id,
+            string_agg(session, album_artists.c.name).label("artists"),
+            func.count().label("artist_count"),
+        )
+        .group_by(album_artists.c.album_id)
+        .subquery()
+    )
+    track_counts = (
+        select(Track.album_id, func.count(Track.id).label("tracks"))
+        .group_by(Track.album_id)
+        .subquery()
+    )
+    session.execute(
+        insert(AlbumSummary).from_select(
+            [
+                "album_id",
+                "name",
+                "user_saved",
+                "artists",
+                "artist_count",
+                "track_count",
+            ],
+            select(
+                Album.id,
+                Album.name,
+                Album.user_saved,
+                artist_names.c.artists,
+                func.coalesce(artist_names.c.artist_count, 0),
+                func.coalesce(track_counts.c.tracks, 0),
+            )
+            .outerjoin(artist_names, artist_names.c.album_id == Album.id)
+            .outerjoin(track_counts, track_counts.c.album_id == Album.id),
+        )
+    )
+
+    session.execute(
+        insert(PlaylistSummary).from_select(
+            ["playlist_id", "title", "track_count"],
+            select(Playlist.id, Playlist.title, func.count(PlaylistTrack.id))
+            .outerjoin(PlaylistTrack, PlaylistTrack.playlist_id == Playlist.id)
+            .group_by(Playlist.id, Playlist.title),
+        )
+    )
+
+    def count(model, *criteria):
+        return select(func.count()).select_from(model).where(*criteria)
+
+    session.execute(
+        insert(LibraryTotals).values(
+            artists=count(Artist).scalar_subquery(),
+            tracks=count(Track).scalar_subquery(),
+            albums=count(Album).scalar_subquery(),
+            playlists=count(Playlist).scalar_subquery(),
+            user_saved_artists=count(Artist, Artist.user_saved).scalar_subquery(),
+            user_saved_albums=count(Album, Album.user_saved).scalar_subquery(),
+            refreshed_at=datetime.now(timezone.utc),
+        )
+    )
+    session.commit()
+
+
+def get_library_totals(session):
+    """Return the library totals computed by the last refresh, or None."""
+    if not inspect(session.get_bind()).has_table(LibraryTotals.__tablename__):
+        return None
+    return session.execute(select(LibraryTotals)).scalar()